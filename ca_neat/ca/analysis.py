@@ -1,16 +1,31 @@
 from itertools import product
-from statistics import mode
 
 from copy import copy
-from operator import itemgetter
-from typing import Sequence, Tuple
+from typing import Optional, Sequence, Tuple
 
+import numpy as np
 from neat.nn import FeedForwardNetwork, create_feed_forward_phenotype
 
+from ca_neat.ca.rule_table import UNDEFINED, compile_rule_table, decode_neighbourhoods
+from ca_neat.ca.rule_table_cache import compile_rule_table_cached
 from ca_neat.config import CAConfig
 from ca_neat.ga.population import create_initial_population
 from ca_neat.geometry.cell_grid import CELL_STATE_T
-from ca_neat.utils import create_state_normalization_rules, invert_value
+from ca_neat.utils import invert_value
+
+
+def enumerate_cppn_rule(cppn: FeedForwardNetwork, ca_config: CAConfig) -> Optional[Sequence[CELL_STATE_T]]:
+    """
+    the next state for every neighbourhood, in the order of product(alphabet, repeat=N),
+    or None if the CPPN overflowed for any of them
+    """
+
+    rule_table = compile_rule_table(cppn, ca_config, quiescent_stable=False)
+
+    if (rule_table == UNDEFINED).any():
+        return None
+
+    return [ca_config.alphabet[i] for i in rule_table.tolist()]
 
 
 def serialize_cppn_rule(cppn: FeedForwardNetwork, ca_config: CAConfig) \
@@ -19,107 +34,128 @@ def serialize_cppn_rule(cppn: FeedForwardNetwork, ca_config: CAConfig) \
 
     inputs = list(product(ca_config.alphabet, repeat=N))
 
-    rules = create_state_normalization_rules(states=ca_config.alphabet)
+    outputs = enumerate_cppn_rule(cppn, ca_config)
 
-    outputs = [
-        max(
-            zip(ca_config.alphabet, cppn.serial_activate([rules.get(x) for x in xs])),
-            key=itemgetter(1)
-        )[0] for xs in inputs
-        ]
+    if outputs is None:
+        raise OverflowError('The CPPN overflowed for some of the neighbourhoods')
 
     return inputs, outputs
 
 
-def calculate_lambda(cppn: FeedForwardNetwork, ca_config: CAConfig) -> float:
-    K = len(ca_config.alphabet)
-    N = len(ca_config.neighbourhood)
-    q = ca_config.alphabet[0]
+class RuleProperties:
+    """
+    Langton-style parameters of the rule a CPPN encodes, all derived from one rule table
+    that goes through the CPPN for every neighbourhood, including the quiescent one.
+    """
 
-    _, outputs = serialize_cppn_rule(cppn, ca_config)
+    def __init__(self, rule_table: np.ndarray, ca_config: CAConfig) -> None:
+        self.rule_table = rule_table
+        self.alphabet = ca_config.alphabet
+        self.K = len(ca_config.alphabet)
+        self.N = len(ca_config.neighbourhood)
+        self.overflowed = bool((rule_table == UNDEFINED).any())
 
-    n = sum(x == q for x in outputs)
+    @classmethod
+    def from_cppn(cls, cppn: FeedForwardNetwork, ca_config: CAConfig) -> 'RuleProperties':
+        return cls(compile_rule_table_cached(cppn, ca_config, quiescent_stable=False), ca_config)
 
-    return (K ** N - n) / (K ** N)
+    def _require_defined(self) -> None:
+        if self.overflowed:
+            raise OverflowError('The CPPN overflowed for some of the neighbourhoods')
 
+    @property
+    def λ(self) -> float:
+        """
+        the fraction of neighbourhoods that lead to a non-quiescent state
+        """
 
-def calculate_sensitivity(cppn: FeedForwardNetwork, ca_config: CAConfig) -> float:
-    alphabet = ca_config.alphabet
-    neighbourhood = ca_config.neighbourhood
+        self._require_defined()
 
-    nbhs = list(product(alphabet, repeat=len(neighbourhood)))
-    rules = create_state_normalization_rules(states=alphabet)
+        n = int((self.rule_table == 0).sum())
 
-    n = len(nbhs)
-    m = len(neighbourhood)
-    quiescent = alphabet[0]
+        return (self.K ** self.N - n) / (self.K ** self.N)
 
-    def transition_f(inputs_discrete_values: Sequence[CELL_STATE_T]) -> CELL_STATE_T:
-        if all((x == quiescent) for x in inputs_discrete_values):
-            return quiescent
+    @property
+    def entropy(self) -> float:
+        """
+        the Shannon entropy (in bits) of the distribution of the next states over all neighbourhoods
+        """
 
-        inputs_float_values = tuple(rules[x] for x in inputs_discrete_values)
+        self._require_defined()
 
-        outputs = cppn.serial_activate(inputs_float_values)
+        p = np.bincount(self.rule_table, minlength=self.K) / len(self.rule_table)
+        p = p[p > 0]
 
-        return max(zip(alphabet, outputs), key=itemgetter(1))[0]
+        return float(-(p * np.log2(p)).sum())
 
-    invert_q = lambda p, q: [(invert_value(x, alphabet) if i == q else x) for i, x in enumerate(p)]
+    @property
+    def sensitivity(self) -> float:
+        """
+        the fraction of (neighbourhood, cell) pairs where inverting the cell changes the next state
+        """
 
-    s = 0
-    for nbh in nbhs:
-        for quiescent in range(m):
-            inv_q = invert_q(nbh, quiescent)
-            try:
-                a = transition_f(nbh)
-                b = transition_f(inv_q)
-            except OverflowError:
-                continue
+        K, m = self.K, self.N
+        n = K ** m
 
-            s += (a != b)
+        rule_table = self.rule_table
+        inverted_states = np.array([self.alphabet.index(invert_value(x, self.alphabet)) for x in self.alphabet])
 
-    mu = s / (n * m)
+        codes = np.arange(n)
+        digits = decode_neighbourhoods(codes, K, m)
+        powers = K ** np.arange(m - 1, -1, -1)
+        a = rule_table[codes]
 
-    return mu
+        s = 0
+        for q in range(m):
+            # the codes of the neighbourhoods with the value of the q-th cell inverted
+            b = rule_table[codes + (inverted_states[digits[:, q]] - digits[:, q]) * powers[q]]
 
+            s += int(((a != b) & (a != UNDEFINED) & (b != UNDEFINED)).sum())
 
-def calculate_dominance(cppn: FeedForwardNetwork, ca_config: CAConfig) -> float:
-    alphabet = ca_config.alphabet
-    neighbourhood = ca_config.neighbourhood
+        return s / (n * m)
+
+    @property
+    def dominance(self) -> int:
+        """
+        the number of neighbourhoods whose next state is their most common state, homogenous ones counting thrice.
+        a neighbourhood of only quiescent cells stays quiescent.
+        """
 
-    nbhs = list(product(alphabet, repeat=len(neighbourhood)))
-    rules = create_state_normalization_rules(states=alphabet)
+        K, N = self.K, self.N
 
-    quiescent = alphabet[0]
+        rule_table = self.rule_table.copy()
+        rule_table[0] = 0
 
-    def transition_f(inputs_discrete_values: Sequence[CELL_STATE_T]) -> CELL_STATE_T:
-        if all((x == quiescent) for x in inputs_discrete_values):
-            return quiescent
+        digits = decode_neighbourhoods(np.arange(K ** N), K, N)
+        counts = np.empty((len(digits), K), dtype=np.intp)
+        first_positions = np.empty((len(digits), K), dtype=np.intp)
 
-        inputs_float_values = tuple(rules[x] for x in inputs_discrete_values)
+        for k in range(K):
+            is_k = digits == k
+            counts[:, k] = is_k.sum(axis=1)
+            first_positions[:, k] = np.where(counts[:, k] > 0, is_k.argmax(axis=1), N)
 
-        outputs = cppn.serial_activate(inputs_float_values)
+        # like statistics.mode, the state that appears first wins a tie
+        most = counts.max(axis=1)
+        modes = np.where(counts == most[:, np.newaxis], first_positions, N + 1).argmin(axis=1)
 
-        return max(zip(alphabet, outputs), key=itemgetter(1))[0]
+        dominated = (rule_table != UNDEFINED) & (rule_table == modes)
+        homogenous = int((dominated & (most == N)).sum())
+        heterogenous = int(dominated.sum()) - homogenous
 
-    heterogenous, homogenous = 0, 0
+        return 3 * homogenous + heterogenous
 
-    for nbh in nbhs:
-        try:
-            output = transition_f(nbh)
-        except OverflowError:
-            continue
 
-        m = mode(nbh)
+def calculate_lambda(cppn: FeedForwardNetwork, ca_config: CAConfig) -> float:
+    return RuleProperties.from_cppn(cppn, ca_config).λ
 
-        if output != m:
-            continue
-        elif all(x == m for x in nbh):
-            homogenous += 1
-        else:
-            heterogenous += 1
 
-    return 3 * homogenous + heterogenous
+def calculate_sensitivity(cppn: FeedForwardNetwork, ca_config: CAConfig) -> float:
+    return RuleProperties.from_cppn(cppn, ca_config).sensitivity
+
+
+def calculate_dominance(cppn: FeedForwardNetwork, ca_config: CAConfig) -> float:
+    return RuleProperties.from_cppn(cppn, ca_config).dominance
 
 
 if __name__ == '__main__':
@@ -127,5 +163,6 @@ if __name__ == '__main__':
 
     gt = next(create_initial_population(NEAT_CONFIG))
     pt = create_feed_forward_phenotype(gt)
-    print(calculate_sensitivity(pt, CA_CONFIG))
-    print(calculate_dominance(pt, CA_CONFIG))
+    properties = RuleProperties.from_cppn(pt, CA_CONFIG)
+    print(properties.sensitivity)
+    print(properties.dominance)
@@ -0,0 +1,122 @@
+from typing import Sequence, Tuple
+
+import numpy as np
+
+from ca_neat.ca.rule_table import UNDEFINED, apply_rule_table, neighbourhood_codes
+from ca_neat.geometry.cell_grid import CELL_STATE_T
+from ca_neat.geometry.neighbourhoods import NEIHGBOURHOOD_T
+
+
+def encode_states(rows: Sequence[Sequence[CELL_STATE_T]], alphabet: Sequence[CELL_STATE_T]) -> np.ndarray:
+    enumeration = dict((v, k) for k, v in enumerate(alphabet))
+
+    return np.array([[enumeration[x] for x in row] for row in rows], dtype=np.uint8)
+
+
+def iterate_ca_batch(cells: np.ndarray, rule_table: np.ndarray, neighbourhood: NEIHGBOURHOOD_T, n_states: int,
+                     n: int, toroidal: bool = True) -> np.ndarray:
+    """
+    steps a batch of CAs that share the same rule, all at once.
+    the first axis of cells is the batch, the remaining axes are the cells of each CA.
+    returns the whole trajectory as an array of shape (n + 1, *cells.shape), the initial states included.
+    stepping stops early if every CA in the batch has reached a fixed point,
+    in which case the trajectory is padded by repeating the last states.
+    """
+
+    trajectory = np.empty((n + 1,) + cells.shape, dtype=cells.dtype)
+    trajectory[0] = cells
+
+    for i in range(1, n + 1):
+        codes = neighbourhood_codes(trajectory[i - 1], neighbourhood, n_states, toroidal)
+        trajectory[i] = apply_rule_table(rule_table, codes, dtype=cells.dtype)
+
+        if np.array_equal(trajectory[i], trajectory[i - 1]):
+            trajectory[i + 1:] = trajectory[i]
+            break
+
+    return trajectory
+
+
+def iterate_ca_population(cells: np.ndarray, rule_tables: np.ndarray, neighbourhood: NEIHGBOURHOOD_T,
+                          n_states: int, n: int, toroidal: bool = True) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    steps a batch of CAs where each CA has its own rule, typically one CA per individual of a generation.
+    rule_tables is a stacked array of shape (batch size, K^N), each CA gathers its next state from its own row.
+    returns the trajectory, as iterate_ca_batch does, and for each CA the first step that visited a neighbourhood
+    for which its rule is undefined (n + 1 if there is none). Undefined cells are set to quiescent,
+    so the rest of the batch can carry on.
+    """
+
+    batch_size = cells.shape[0]
+    table_size = rule_tables.shape[1]
+
+    # offset each CA's codes into its own row of the flattened rule tables
+    row_offsets = (np.arange(batch_size) * table_size).reshape((batch_size,) + (1,) * (cells.ndim - 1))
+    flat_rule_tables = rule_tables.ravel()
+
+    trajectory = np.empty((n + 1,) + cells.shape, dtype=cells.dtype)
+    trajectory[0] = cells
+
+    first_undefined = np.full(batch_size, n + 1, dtype=np.intp)
+
+    for i in range(1, n + 1):
+        codes = neighbourhood_codes(trajectory[i - 1], neighbourhood, n_states, toroidal)
+        new_cells = flat_rule_tables[codes + row_offsets]
+
+        undefined = new_cells == UNDEFINED
+        if undefined.any():
+            is_undefined = undefined.reshape(batch_size, -1).any(axis=1)
+            first_undefined[is_undefined & (first_undefined > i)] = i
+            new_cells[undefined] = 0
+
+        trajectory[i] = new_cells
+
+        if np.array_equal(trajectory[i], trajectory[i - 1]):
+            trajectory[i + 1:] = trajectory[i]
+            break
+
+    return trajectory, first_undefined
+
+
+def fingerprint_cells(cells: np.ndarray, batch_dims: int = 1) -> np.ndarray:
+    """
+    computes a 64 bit polynomial hash of the cells of each CA, the first batch_dims axes are kept
+    """
+
+    flat = cells.reshape(cells.shape[:batch_dims] + (-1,)).astype(np.uint64)
+    # odd weights make the hash of a single value, such as a bit-packed row, collision free
+    weights = np.random.RandomState(seed=flat.shape[-1]).randint(1, 2 ** 62, size=flat.shape[-1]).astype(np.uint64)
+    weights |= np.uint64(1)
+
+    # overflow is intended, the hash is computed modulo 2^64
+    with np.errstate(over='ignore'):
+        return (flat * weights).sum(axis=-1, dtype=np.uint64)
+
+
+def find_cycle_ends(trajectory: np.ndarray) -> np.ndarray:
+    """
+    for each CA in a batch trajectory, finds the first step that repeats an earlier state.
+    this is where iterate_ca_n_times_or_until_cycle_found would have stopped, if no state repeats the last step is used.
+    """
+
+    steps, batch_size = trajectory.shape[:2]
+
+    if steps < 2:
+        return np.zeros(batch_size, dtype=np.intp)
+
+    fingerprints = fingerprint_cells(trajectory, batch_dims=2)
+
+    # after a stable sort of each column identical fingerprints are adjacent and ordered by step,
+    # so every entry that equals its predecessor is a repetition of an earlier state
+    order = np.argsort(fingerprints, axis=0, kind='mergesort')
+    columns = np.arange(batch_size)
+    sorted_fingerprints = fingerprints[order, columns]
+
+    is_repeat = sorted_fingerprints[1:] == sorted_fingerprints[:-1]
+    repeat_steps = np.where(is_repeat, order[1:], steps - 1)
+
+    return repeat_steps.min(axis=0)
+
+
+def final_states(trajectory: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    return trajectory[ends, np.arange(trajectory.shape[1])]
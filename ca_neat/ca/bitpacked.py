@@ -0,0 +1,217 @@
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+from ca_neat.ca.rule_table import UNDEFINED
+from ca_neat.geometry.neighbourhoods import COORD_T, NEIHGBOURHOOD_T
+
+# Bit-packed CAs for two state alphabets (ALPHABET_2). Each row of cells is packed into a single 64 bit word,
+# bit x holding the state index of the cell at x, so 1D CAs are arrays of words and 2D CAs are arrays of rows of words.
+# Rules are applied bit-sliced: the rule table is compiled to a boolean function of the neighbourhood bits,
+# which is then evaluated on whole words, stepping 64 cells with every operation.
+
+WORD_BITS = 64
+
+# for each input, the indices of the low (input is 0) and high (input is 1) sub-functions of every sub-function
+# of that level, and the constant values of the sub-functions below the last level
+BITSLICED_RULE_T = Tuple[Sequence[Tuple[np.ndarray, np.ndarray]], np.ndarray]
+
+_POPCOUNT_8 = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+def word_mask(width: int) -> np.uint64:
+    return np.uint64(2 ** width - 1)
+
+
+def pack_rows(cells: np.ndarray) -> np.ndarray:
+    """
+    packs the last axis of an array of state indices (0 or 1) into words
+    """
+
+    width = cells.shape[-1]
+    if width > WORD_BITS:
+        raise ValueError('Rows of {} cells do not fit in a {} bit word'.format(width, WORD_BITS))
+
+    weights = np.left_shift(np.uint64(1), np.arange(width, dtype=np.uint64))
+
+    return (cells.astype(np.uint64) * weights).sum(axis=-1, dtype=np.uint64)
+
+
+def unpack_rows(words: np.ndarray, width: int) -> np.ndarray:
+    bits = np.right_shift(words[..., np.newaxis], np.arange(width, dtype=np.uint64)) & np.uint64(1)
+
+    return bits.astype(np.uint8)
+
+
+def popcount(words: np.ndarray) -> np.ndarray:
+    """
+    the number of set bits of each word
+    """
+
+    octets = np.ascontiguousarray(words, dtype=np.uint64).view(np.uint8).reshape(words.shape + (8,))
+
+    return _POPCOUNT_8[octets].sum(axis=-1)
+
+
+def shift_words(words: np.ndarray, offset: COORD_T, width: int, toroidal: bool) -> np.ndarray:
+    """
+    the bit-packed equivalent of rule_table.shift_cells: each cell gets the value of the cell at the given offset.
+    the x offset shifts the bits within each word, the y offset (for 2D CAs) shifts the words along the last axis.
+    """
+
+    dx = offset[0]
+    mask = word_mask(width)
+
+    if toroidal:
+        dx %= width
+
+    if dx == 0:
+        shifted = words
+    elif abs(dx) >= width:
+        shifted = np.zeros_like(words)
+    elif dx > 0:
+        shifted = words >> np.uint64(dx)
+        if toroidal:
+            shifted = shifted | ((words << np.uint64(width - dx)) & mask)
+    else:
+        shifted = (words << np.uint64(-dx)) & mask
+
+    if len(offset) == 1:
+        return shifted
+
+    dy = offset[1]
+    if dy == 0:
+        return shifted
+
+    if toroidal:
+        return np.roll(shifted, shift=-dy, axis=-1)
+
+    height = words.shape[-1]
+    moved = np.zeros_like(shifted)
+    if abs(dy) < height:
+        if dy > 0:
+            moved[..., :height - dy] = shifted[..., dy:]
+        else:
+            moved[..., -dy:] = shifted[..., :height + dy]
+
+    return moved
+
+
+def _distinct_rows(rows: np.ndarray) -> Tuple[np.ndarray, List[int]]:
+    indices = {}
+    inverse = []
+    first = []
+
+    for i, row in enumerate(rows):
+        key = row.tobytes()
+        if key not in indices:
+            indices[key] = len(first)
+            first.append(i)
+        inverse.append(indices[key])
+
+    return rows[first], inverse
+
+
+def compile_bitsliced_rule(truth_table: np.ndarray) -> BITSLICED_RULE_T:
+    """
+    compiles a boolean function of N inputs, given as a truth table of 2^N values ordered like a rule table,
+    by splitting it on one input at a time (Shannon expansion), starting with the first one.
+    identical sub-functions are shared, so each level only holds the distinct sub-tables of the table.
+    """
+
+    table = np.asarray(truth_table, dtype=np.uint8)
+    N = len(table).bit_length() - 1
+
+    if len(table) != 2 ** N:
+        raise ValueError('A truth table must have 2^N entries')
+
+    levels = []
+    sub_tables = table.reshape(1, -1)
+
+    for _ in range(N):
+        # the first half of each sub-table is where the input is 0, the second half where it is 1
+        halves, inverse = _distinct_rows(sub_tables.reshape(2 * len(sub_tables), -1))
+        levels.append((np.array(inverse[0::2], dtype=np.intp), np.array(inverse[1::2], dtype=np.intp)))
+        sub_tables = halves
+
+    return levels, sub_tables[:, 0]
+
+
+def evaluate_bitsliced_rule(rule: BITSLICED_RULE_T, planes: Sequence[np.ndarray], width: int) -> np.ndarray:
+    """
+    evaluates a compiled boolean function, where planes holds the words of each input
+    """
+
+    levels, constants = rule
+    mask = word_mask(width)
+
+    values = (constants.astype(np.uint64) * mask).reshape((-1,) + (1,) * planes[0].ndim)
+
+    # evaluate the levels bottom up, each one choosing between its low and high sub-functions with a multiplexer
+    for (lo_indices, hi_indices), plane in zip(reversed(levels), reversed(planes)):
+        lo = values[lo_indices]
+        hi = values[hi_indices]
+        values = lo ^ ((lo ^ hi) & plane)
+
+    return values[0]
+
+
+def compile_rule_table_bitsliced(rule_table: np.ndarray) -> Tuple[BITSLICED_RULE_T, BITSLICED_RULE_T]:
+    """
+    compiles a rule table of a two state CA to a boolean function of the next state,
+    and one that tells if the neighbourhood is one for which the rule is undefined
+    """
+
+    defined = rule_table[rule_table != UNDEFINED]
+    if ((defined != 0) & (defined != 1)).any():
+        raise ValueError('Only rule tables of two state CAs can be bit-sliced')
+
+    return compile_bitsliced_rule(rule_table == 1), compile_bitsliced_rule(rule_table == UNDEFINED)
+
+
+def iterate_ca_batch_bitpacked(words: np.ndarray, rule_table: np.ndarray, neighbourhood: NEIHGBOURHOOD_T, width: int,
+                               n: int, toroidal: bool = True) -> np.ndarray:
+    """
+    the bit-packed equivalent of batch.iterate_ca_batch, for a batch of two state CAs that share the same rule.
+    returns the trajectory of packed words, of shape (n + 1, *words.shape).
+    """
+
+    rule, undefined_rule = compile_rule_table_bitsliced(rule_table)
+    may_be_undefined = (rule_table == UNDEFINED).any()
+
+    trajectory = np.empty((n + 1,) + words.shape, dtype=np.uint64)
+    trajectory[0] = words
+
+    for i in range(1, n + 1):
+        planes = [shift_words(trajectory[i - 1], offset, width, toroidal) for offset in neighbourhood]
+
+        if may_be_undefined and evaluate_bitsliced_rule(undefined_rule, planes, width).any():
+            raise OverflowError('The CA visited a neighbourhood for which the rule is undefined')
+
+        trajectory[i] = evaluate_bitsliced_rule(rule, planes, width)
+
+        if np.array_equal(trajectory[i], trajectory[i - 1]):
+            trajectory[i + 1:] = trajectory[i]
+            break
+
+    return trajectory
+
+
+if __name__ == '__main__':
+    from ca_neat.ca.batch import iterate_ca_batch
+    from ca_neat.geometry.neighbourhoods import LLLCRRR, VON_NEUMANN
+
+    random = np.random.RandomState(0)
+
+    for neighbourhood, shape in ((LLLCRRR, (20, 49)), (VON_NEUMANN, (20, 7, 9)), (VON_NEUMANN, (3, 5, 64))):
+        for toroidal in (True, False):
+            rule_table = random.randint(0, 2, size=2 ** len(neighbourhood)).astype(np.int16)
+            rule_table[0] = 0
+            cells = random.randint(0, 2, size=shape).astype(np.uint8)
+
+            expected = iterate_ca_batch(cells, rule_table, neighbourhood, n_states=2, n=30, toroidal=toroidal)
+            packed = iterate_ca_batch_bitpacked(pack_rows(cells), rule_table, neighbourhood, width=shape[-1], n=30,
+                                                toroidal=toroidal)
+
+            assert np.array_equal(unpack_rows(packed, shape[-1]), expected)
+            assert np.array_equal(popcount(packed), expected.sum(axis=-1))
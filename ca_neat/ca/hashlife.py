@@ -0,0 +1,343 @@
+from functools import lru_cache
+from typing import Dict, Iterator, List, Sequence, Tuple, Union
+
+from ca_neat.ca.iterate import TRANSITION_F_T
+from ca_neat.geometry.cell_grid import CELL_STATE_T, CellGrid2D, FiniteCellGrid2D
+from ca_neat.geometry.neighbourhoods import COORD_2D_T, NEIHGBOURHOOD_2D_T, radius_2d
+
+# Hashlife steps unbounded 2D CAs with radius 1 neighbourhoods (VON_NEUMANN, MOORE) on a quadtree.
+# Identical subtrees are interned, so a node is shared by every region of the plane with the same contents,
+# and the future of each node is memoized, so repeated structure is only ever computed once.
+# Like iterate_ca_once_incremental, the rule must keep a neighbourhood of only dead cells dead.
+
+
+class Node:
+    """
+    a square of 2^k by 2^k cells, made of the quadrants a (top left), b (top right), c (bottom left), d (bottom right).
+    the quadrants of a level 1 node are the indices of the states of single cells.
+    nodes are interned by HashLife, so two nodes are equal only if they are the same object.
+    """
+
+    __slots__ = ('k', 'a', 'b', 'c', 'd', 'population')
+
+    def __init__(self, a: 'CHILD_T', b: 'CHILD_T', c: 'CHILD_T', d: 'CHILD_T') -> None:
+        self.a = a
+        self.b = b
+        self.c = c
+        self.d = d
+
+        if isinstance(a, int):
+            self.k: int = 1
+            self.population: int = sum(1 for x in (a, b, c, d) if x != 0)
+        else:
+            self.k: int = a.k + 1
+            self.population: int = a.population + b.population + c.population + d.population
+
+
+CHILD_T = Union[Node, int]
+
+
+class HashLife:
+    """
+    holds the interned nodes and the memoized successors for one transition function
+    """
+
+    def __init__(self, transition_f: TRANSITION_F_T, cell_states: Sequence[CELL_STATE_T],
+                 neighbourhood: NEIHGBOURHOOD_2D_T) -> None:
+        if radius_2d(neighbourhood) != 1:
+            raise ValueError('HashLife only supports neighbourhoods with a radius of 1')
+
+        self.transition_f = lru_cache(maxsize=None)(transition_f)
+        self.cell_states = cell_states
+        self.enumeration = dict((v, k) for k, v in enumerate(cell_states))
+        self.neighbourhood = neighbourhood
+
+        self._nodes: Dict[Tuple[CHILD_T, CHILD_T, CHILD_T, CHILD_T], Node] = {}
+        self._empty: Dict[int, Node] = {}
+        self._successors: Dict[Tuple[Node, int], Node] = {}
+
+    def join(self, a: CHILD_T, b: CHILD_T, c: CHILD_T, d: CHILD_T) -> Node:
+        key = (a, b, c, d)
+
+        node = self._nodes.get(key)
+        if node is None:
+            node = Node(a, b, c, d)
+            self._nodes[key] = node
+
+        return node
+
+    def empty(self, k: int) -> Node:
+        node = self._empty.get(k)
+
+        if node is None:
+            if k == 1:
+                node = self.join(0, 0, 0, 0)
+            else:
+                z = self.empty(k - 1)
+                node = self.join(z, z, z, z)
+
+            self._empty[k] = node
+
+        return node
+
+    def centre(self, node: Node) -> Node:
+        """
+        embeds the node in the centre of an empty node twice its size
+        """
+
+        z = self.empty(node.k - 1)
+
+        return self.join(
+            self.join(z, z, z, node.a),
+            self.join(z, z, node.b, z),
+            self.join(z, node.c, z, z),
+            self.join(node.d, z, z, z),
+        )
+
+    @staticmethod
+    def is_padded(node: Node) -> bool:
+        """
+        whether all of the live cells of a node of level 4 or more are within its central quarter
+        """
+
+        return (
+            node.a.population == node.a.d.d.population and
+            node.b.population == node.b.c.c.population and
+            node.c.population == node.c.b.b.population and
+            node.d.population == node.d.a.a.population
+        )
+
+    def _step_4x4(self, node: Node) -> Node:
+        # the central 2x2 cells of a level 2 node after a single generation
+        a, b, c, d = node.a, node.b, node.c, node.d
+        cells = (
+            (a.a, a.b, b.a, b.b),
+            (a.c, a.d, b.c, b.d),
+            (c.a, c.b, d.a, d.b),
+            (c.c, c.d, d.c, d.d),
+        )
+        cell_states = self.cell_states
+
+        def step(x: int, y: int) -> int:
+            inputs = tuple(cell_states[cells[y + dy][x + dx]] for (dx, dy) in self.neighbourhood)
+            return self.enumeration[self.transition_f(inputs)]
+
+        return self.join(step(1, 1), step(2, 1), step(1, 2), step(2, 2))
+
+    def successor(self, node: Node, j: int) -> Node:
+        """
+        the central quarter of a node of level k >= 2, advanced 2^j generations, where j is at most k - 2
+        """
+
+        j = min(j, node.k - 2)
+        key = (node, j)
+
+        result = self._successors.get(key)
+        if result is not None:
+            return result
+
+        if node.population == 0:
+            result = node.a
+        elif node.k == 2:
+            result = self._step_4x4(node)
+        else:
+            a, b, c, d = node.a, node.b, node.c, node.d
+            join = self.join
+
+            # the nine overlapping sub-squares of half the size of the node
+            c1 = self.successor(a, j)
+            c2 = self.successor(join(a.b, b.a, a.d, b.c), j)
+            c3 = self.successor(b, j)
+            c4 = self.successor(join(a.c, a.d, c.a, c.b), j)
+            c5 = self.successor(join(a.d, b.c, c.b, d.a), j)
+            c6 = self.successor(join(b.c, b.d, d.a, d.b), j)
+            c7 = self.successor(c, j)
+            c8 = self.successor(join(c.b, d.a, c.d, d.c), j)
+            c9 = self.successor(d, j)
+
+            if j < node.k - 2:
+                # the sub-squares have already advanced far enough, only their centres need to be stitched together
+                result = join(
+                    join(c1.d, c2.c, c4.b, c5.a),
+                    join(c2.d, c3.c, c5.b, c6.a),
+                    join(c4.d, c5.c, c7.b, c8.a),
+                    join(c5.d, c6.c, c8.b, c9.a),
+                )
+            else:
+                result = join(
+                    self.successor(join(c1, c2, c4, c5), j),
+                    self.successor(join(c2, c3, c5, c6), j),
+                    self.successor(join(c4, c5, c7, c8), j),
+                    self.successor(join(c5, c6, c8, c9), j),
+                )
+
+        self._successors[key] = result
+
+        return result
+
+    def advance(self, node: Node, generations: int) -> Node:
+        """
+        advances a node centred at the origin by any number of generations, jumping 2^j generations at a time.
+        the node is grown as needed, so the result is a (possibly larger) node that is still centred at the origin.
+        """
+
+        j = 0
+        while generations:
+            if generations & 1:
+                # pad the node so that nothing can grow out of the central quarter that successor returns
+                while node.k < max(4, j + 2) or not self.is_padded(node):
+                    node = self.centre(node)
+
+                node = self.successor(self.centre(node), j)
+
+            generations >>= 1
+            j += 1
+
+        return node
+
+    def from_cells(self, cells: Dict[COORD_2D_T, int]) -> Node:
+        """
+        builds the smallest node centred at the origin that contains the given cells, a node of level k
+        covers the coordinates from -2^(k-1) up to (but excluding) 2^(k-1) along both axes
+        """
+
+        extent = max((max(-x, x + 1, -y, y + 1) for (x, y) in cells), default=1)
+        k = 2
+        while 2 ** (k - 1) < extent:
+            k += 1
+
+        def build(live: List[Tuple[int, int, int]], k: int, x0: int, y0: int) -> CHILD_T:
+            if not live:
+                return 0 if k == 0 else self.empty(k)
+
+            if k == 0:
+                return live[0][2]
+
+            h = 2 ** (k - 1)
+            quadrants = ([], [], [], [])
+            for cell in live:
+                x, y, _ = cell
+                quadrants[(2 if y >= y0 + h else 0) + (1 if x >= x0 + h else 0)].append(cell)
+
+            a, b, c, d = quadrants
+
+            return self.join(
+                build(a, k - 1, x0, y0),
+                build(b, k - 1, x0 + h, y0),
+                build(c, k - 1, x0, y0 + h),
+                build(d, k - 1, x0 + h, y0 + h),
+            )
+
+        live = [(x, y, i) for ((x, y), i) in cells.items() if i != 0]
+        half = 2 ** (k - 1)
+
+        return build(live, k, -half, -half)
+
+    def to_cells(self, node: Node) -> Dict[COORD_2D_T, int]:
+        """
+        the live cells of a node centred at the origin
+        """
+
+        cells = {}
+
+        def collect(node: CHILD_T, k: int, x0: int, y0: int) -> None:
+            if k == 0:
+                if node != 0:
+                    cells[(x0, y0)] = node
+                return
+
+            if node.population == 0:
+                return
+
+            h = 2 ** (k - 1)
+            collect(node.a, k - 1, x0, y0)
+            collect(node.b, k - 1, x0 + h, y0)
+            collect(node.c, k - 1, x0, y0 + h)
+            collect(node.d, k - 1, x0 + h, y0 + h)
+
+        half = 2 ** (node.k - 1)
+        collect(node, node.k, -half, -half)
+
+        return cells
+
+    def from_grid(self, grid: CellGrid2D) -> Node:
+        enumeration = self.enumeration
+
+        return self.from_cells(dict((coord, enumeration[cell]) for (coord, cell) in grid.get_live_cells()))
+
+    def to_grid(self, node: Node, template: CellGrid2D) -> CellGrid2D:
+        """
+        converts a node to a grid with the same settings as the template.
+        the origin is set even if it is dead when the template contains it, like iterate_ca_once does.
+        """
+
+        cell_states = self.cell_states
+
+        new = template.empty_copy()
+        for coord, i in self.to_cells(node).items():
+            new.set(coord, cell_states[i])
+
+        if template.origin in template and template.origin not in new:
+            new.set(template.origin, template.dead_cell)
+
+        return new
+
+
+def _create_hashlife(grid: CellGrid2D, transition_f: TRANSITION_F_T) -> HashLife:
+    if not isinstance(grid, CellGrid2D) or isinstance(grid, FiniteCellGrid2D):
+        raise ValueError('HashLife only supports unbounded 2D grids')
+
+    return HashLife(transition_f, grid.cell_states, grid.neighbourhood)
+
+
+def advance_ca(initial_grid: CellGrid2D, transition_f: TRANSITION_F_T, generations: int) -> CellGrid2D:
+    hashlife = _create_hashlife(initial_grid, transition_f)
+    node = hashlife.advance(hashlife.from_grid(initial_grid), generations)
+
+    return hashlife.to_grid(node, initial_grid)
+
+
+def iterate_ca_n_times_hashlife(initial_grid: CellGrid2D, transition_f: TRANSITION_F_T, n: int,
+                                generations_per_step: int = 1) -> Iterator[CellGrid2D]:
+    """
+    yields the same grids as iterate_ca_n_times, or every generations_per_step-th of them if it is greater than 1.
+    the quadtree and the memoized successors are kept between the steps.
+    """
+
+    hashlife = _create_hashlife(initial_grid, transition_f)
+    node = hashlife.from_grid(initial_grid)
+    grid = initial_grid
+
+    for _ in range(n):
+        node = hashlife.advance(node, generations_per_step)
+        # once set, the origin stays in the grid, so the previous grid is the template for the next one
+        grid = hashlife.to_grid(node, grid)
+        yield grid
+
+
+if __name__ == '__main__':
+    from itertools import islice
+    from ca_neat.ca.iterate import iterate_ca_n_times
+    from ca_neat.geometry.neighbourhoods import MOORE
+
+    def game_of_life(inputs: Sequence[CELL_STATE_T]) -> CELL_STATE_T:
+        alive = sum(1 for x in inputs if x == '1') - (inputs[4] == '1')
+        return '1' if alive == 3 or (alive == 2 and inputs[4] == '1') else '0'
+
+    glider = (
+        ('0', '1', '0'),
+        ('0', '0', '1'),
+        ('1', '1', '1'),
+    )
+
+    grid = CellGrid2D(cell_states='01', neighbourhood=MOORE)
+    grid.add_pattern_at_coord(glider, (0, 0))
+
+    for a, b in zip(iterate_ca_n_times(grid, game_of_life, 20), iterate_ca_n_times_hashlife(grid, game_of_life, 20)):
+        assert dict(a.get_live_cells()) == dict(b.get_live_cells())
+
+    # a glider moves one cell diagonally every 4 generations
+    far = advance_ca(grid, game_of_life, 4096)
+    assert sorted(far.get_live_cells()) == sorted(((x + 1024, y + 1024), v) for ((x, y), v) in grid.get_live_cells())
+    assert list(islice(iterate_ca_n_times_hashlife(grid, game_of_life, 3, generations_per_step=4), 1))[0] == \
+        list(iterate_ca_n_times(grid, game_of_life, 4))[-1]
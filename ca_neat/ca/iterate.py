@@ -1,7 +1,9 @@
 from functools import lru_cache
-from typing import Callable, Iterator, Sequence
+from typing import Callable, Dict, Generator, Iterator, Optional, Sequence, Set, Tuple
 
 from ca_neat.geometry.cell_grid import CELL_STATE_T, CellGrid
+from ca_neat.geometry.neighbourhoods import COORD_T
+from ca_neat.utils import tuple_add
 
 TRANSITION_F_T = Callable[[Sequence[CELL_STATE_T]], CELL_STATE_T]
 ITERATE_F_T = Callable[[CellGrid, TRANSITION_F_T], CellGrid]
@@ -18,6 +20,39 @@ def iterate_ca_once(grid: CellGrid, transition_f: TRANSITION_F_T) -> CellGrid:
     return new
 
 
+def iterate_ca_once_incremental(grid: CellGrid, transition_f: TRANSITION_F_T) -> CellGrid:
+    """
+    only re-evaluates the cells that have a cell in their neighbourhood that changed in the previous step.
+    the transition function must map a neighbourhood of only dead cells to a dead cell,
+    then every other cell is guaranteed to keep its state.
+    the first step, or any step from a grid that was not produced by this function, evaluates all of the cells.
+    """
+
+    new = grid.empty_copy()
+    new.update(grid)
+
+    if grid.changed_coords is None:
+        coords = grid.iterate_coords()
+    else:
+        # a cell sees a changed cell c through the offset o if it is located at c - o
+        offsets = tuple(tuple(-d for d in direction) for direction in grid.neighbourhood)
+        coords = set(tuple_add(coord, offset) for coord in grid.changed_coords for offset in offsets)
+
+    changed_coords: Set[COORD_T] = set()
+
+    for coord in coords:
+        inputs = grid.get_neighbourhood_values(coord)
+        output = transition_f(inputs)
+
+        if output != grid.get(coord):
+            new.set(coord, output)
+            changed_coords.add(coord)
+
+    new.changed_coords = changed_coords
+
+    return new
+
+
 def iterate_ca_once_with_coord_inputs(grid: CellGrid, transition_f: TRANSITION_F_T) -> CellGrid:
     new = grid.empty_copy()
 
@@ -42,15 +77,25 @@ def iterate_ca_n_times(initial_grid: CellGrid, transition_f: TRANSITION_F_T, n:
 
 
 def iterate_ca_n_times_or_until_cycle_found(initial_grid: CellGrid, transition_f: TRANSITION_F_T, n: int,
-                                            iterate_f: ITERATE_F_T = iterate_ca_once) -> Iterator[CellGrid]:
-    seen = {initial_grid}
+                                            iterate_f: ITERATE_F_T = iterate_ca_once
+                                            ) -> Generator[CellGrid, None, Optional[Tuple[int, int]]]:
+    """
+    returns (step the cycle is entered at, cycle length) once a state repeats, or None if none repeats within n steps.
+    the return value is the value of the StopIteration, a for loop ignores it.
+    """
+
+    # Only a 64 bit fingerprint of each visited grid is kept, mapped to the step it was seen at.
+    seen: Dict[int, int] = {initial_grid.fingerprint(): 0}
 
-    for new in iterate_ca_n_times(initial_grid, transition_f, n, iterate_f):
+    for i, new in enumerate(iterate_ca_n_times(initial_grid, transition_f, n, iterate_f), start=1):
         yield new
 
-        if new in seen:
+        fingerprint = new.fingerprint()
+
+        if fingerprint in seen:
             # When a cycle is found, the function will terminate, but not before yielding the state that was repeated.
-            # The function that is calling this function can enumerate and compare the outputs to determine cycle length.
-            return
+            return seen[fingerprint], i - seen[fingerprint]
         else:
-            seen.add(new)
+            seen[fingerprint] = i
+
+    return None
@@ -0,0 +1,305 @@
+from typing import Callable, Iterator, Sequence, Tuple
+
+import numpy as np
+from neat.nn import FeedForwardNetwork
+
+from ca_neat.ca.iterate import ITERATE_F_T, TRANSITION_F_T
+from ca_neat.config import CAConfig
+from ca_neat.geometry.array_cell_grid import ArrayCellGrid2D, ToroidalArrayCellGrid2D
+from ca_neat.geometry.cell_grid import CELL_STATE_T
+from ca_neat.geometry.neighbourhoods import COORD_2D_T, COORD_T, NEIHGBOURHOOD_T, wrapped_neighbour_indices
+from ca_neat.nn.batch import BatchFeedForwardNetwork, argmax_first
+from ca_neat.nn.prune import prune_network
+from ca_neat.utils import create_state_normalization_rules
+
+# Rule tables map the base-K encoding of a neighbourhood to the index of the next state.
+# The encoding follows the enumeration order of product(alphabet, repeat=N), as in serialize_cppn_rule,
+# so the first cell of the neighbourhood is the most significant digit.
+# Entries that could not be computed (the CPPN overflowed) are marked with UNDEFINED.
+UNDEFINED = -1
+
+# Coordinate rule tables are for CAs where the next state also depends on the position of the cell, they hold
+# one row of K^N entries for each cell of a grid, in the flat order of the cell array.
+# Only a small part of the entries is ever visited, so they are computed lazily, by a COORD_RULE_F_T that
+# gets the flat positions and neighbourhood codes of the missing entries and returns their state indices.
+# Entries that have not been computed yet are marked with NOT_COMPUTED.
+NOT_COMPUTED = -2
+COORD_RULE_F_T = Callable[[np.ndarray, np.ndarray], Sequence[int]]
+
+RULE_TABLE_CHUNK_SIZE = 2 ** 16
+
+
+def compile_rule_table(cppn: FeedForwardNetwork, ca_config: CAConfig, quiescent_stable: bool = True) -> np.ndarray:
+    """
+    enumerates all K^N neighbourhoods and stores the resulting state index for each of them.
+    if quiescent_stable is set, a neighbourhood of only quiescent cells always produces a quiescent cell,
+    like the transition functions used by most of the problems.
+    """
+
+    alphabet = ca_config.alphabet
+    K = len(alphabet)
+    N = len(ca_config.neighbourhood)
+    rules = create_state_normalization_rules(states=alphabet)
+    normalized_states = np.array([rules[x] for x in alphabet])
+
+    # only the nodes in the key of the table are evaluated, an unused node that overflows leaves the table defined
+    network = BatchFeedForwardNetwork(prune_network(cppn))
+    rule_table = np.empty(K ** N, dtype=np.int16)
+
+    # the neighbourhoods are evaluated in chunks, to bound the memory used for the values of the nodes
+    for start in range(0, K ** N, RULE_TABLE_CHUNK_SIZE):
+        codes = np.arange(start, min(start + RULE_TABLE_CHUNK_SIZE, K ** N))
+        outputs, overflowed = network.activate(normalized_states[decode_neighbourhoods(codes, K, N)])
+
+        rule_table[codes] = np.where(overflowed, UNDEFINED, argmax_first(outputs))
+
+    if quiescent_stable:
+        rule_table[0] = 0
+
+    return rule_table
+
+
+def shift_cells(cells: np.ndarray, offset: COORD_T, toroidal: bool) -> np.ndarray:
+    """
+    returns an array where each cell holds the value of the cell at the given offset from it.
+    the offset applies to the last len(offset) axes, any leading axes are treated as a batch.
+    coordinates are ordered (x, y) while the array axes are ordered (y, x), so the offset is reversed.
+    cells that fall outside of a finite grid are quiescent.
+    """
+
+    offset = tuple(reversed(offset))
+    d = len(offset)
+    axes = tuple(range(cells.ndim - d, cells.ndim))
+
+    if toroidal:
+        return np.roll(cells, shift=tuple(-o for o in offset), axis=axes)
+
+    r = max(abs(o) for o in offset)
+    if r == 0:
+        return cells
+
+    padded = np.pad(cells, [(0, 0)] * (cells.ndim - d) + [(r, r)] * d, mode='constant')
+    index = (Ellipsis,) + tuple(slice(r + o, r + o + cells.shape[axis]) for o, axis in zip(offset, axes))
+
+    return padded[index]
+
+
+def neighbourhood_codes(cells: np.ndarray, neighbourhood: NEIHGBOURHOOD_T, n_states: int,
+                        toroidal: bool) -> np.ndarray:
+    if toroidal:
+        # gather all of the neighbourhoods at once through the cached map of wrapped neighbour positions
+        d = len(neighbourhood[0])
+        index = wrapped_neighbour_indices(cells.shape[cells.ndim - d:], tuple(neighbourhood))
+        values = cells.reshape(cells.shape[:cells.ndim - d] + (-1,))[..., index]
+        powers = n_states ** np.arange(len(neighbourhood) - 1, -1, -1, dtype=np.intp)
+
+        return np.dot(values, powers).reshape(cells.shape)
+
+    codes = np.zeros(cells.shape, dtype=np.intp)
+
+    for offset in neighbourhood:
+        codes *= n_states
+        codes += shift_cells(cells, offset, toroidal)
+
+    return codes
+
+
+def apply_rule_table(rule_table: np.ndarray, codes: np.ndarray, dtype=np.uint8) -> np.ndarray:
+    new_cells = rule_table[codes]
+
+    if (new_cells == UNDEFINED).any():
+        raise OverflowError('The CA visited a neighbourhood for which the rule is undefined')
+
+    return new_cells.astype(dtype)
+
+
+def iterate_ca_once_with_rule_table(grid: ArrayCellGrid2D, rule_table: np.ndarray) -> ArrayCellGrid2D:
+    codes = neighbourhood_codes(
+        cells=grid.cells,
+        neighbourhood=grid.neighbourhood,
+        n_states=len(grid.cell_states),
+        toroidal=isinstance(grid, ToroidalArrayCellGrid2D),
+    )
+
+    return grid.with_cells(apply_rule_table(rule_table, codes, dtype=grid.cells.dtype))
+
+
+def iterate_ca_n_times_with_rule_table(initial_grid: ArrayCellGrid2D, rule_table: np.ndarray,
+                                       n: int) -> Iterator[ArrayCellGrid2D]:
+    grid = initial_grid
+
+    for _ in range(n):
+        grid = iterate_ca_once_with_rule_table(grid, rule_table)
+        yield grid
+
+
+def create_transition_f(rule_table: np.ndarray, alphabet: Sequence[CELL_STATE_T]) -> TRANSITION_F_T:
+    """
+    wraps a rule table as a regular transition function, for use with the per-cell iteration functions
+    """
+
+    K = len(alphabet)
+    enumeration = dict((v, k) for k, v in enumerate(alphabet))
+
+    def transition_f(inputs_discrete_values: Sequence[CELL_STATE_T]) -> CELL_STATE_T:
+        code = 0
+        for x in inputs_discrete_values:
+            code = code * K + enumeration[x]
+
+        i = rule_table[code]
+        if i == UNDEFINED:
+            raise OverflowError('The CA visited a neighbourhood for which the rule is undefined')
+
+        return alphabet[i]
+
+    return transition_f
+
+
+def create_iterate_f(rule_table: np.ndarray) -> ITERATE_F_T:
+    """
+    wraps a rule table as an iterate_f, so that array grids can be stepped with iterate_ca_n_times and
+    iterate_ca_n_times_or_until_cycle_found. The transition_f passed to these functions is ignored.
+    """
+
+    def iterate_f(grid: ArrayCellGrid2D, transition_f: TRANSITION_F_T) -> ArrayCellGrid2D:
+        return iterate_ca_once_with_rule_table(grid, rule_table)
+
+    return iterate_f
+
+
+def create_coord_rule_table(grid: ArrayCellGrid2D, quiescent_stable: bool = True) -> np.ndarray:
+    h, w = grid.shape
+    rule_table = np.full((h * w, len(grid.cell_states) ** len(grid.neighbourhood)), NOT_COMPUTED, dtype=np.int16)
+
+    if quiescent_stable:
+        rule_table[:, 0] = 0
+
+    return rule_table
+
+
+def iterate_ca_once_with_coord_rule_table(grid: ArrayCellGrid2D, rule_table: np.ndarray,
+                                          rule_f: COORD_RULE_F_T) -> ArrayCellGrid2D:
+    codes = neighbourhood_codes(
+        cells=grid.cells,
+        neighbourhood=grid.neighbourhood,
+        n_states=len(grid.cell_states),
+        toroidal=isinstance(grid, ToroidalArrayCellGrid2D),
+    ).ravel()
+    positions = np.arange(codes.size)
+
+    new_cells = rule_table[positions, codes]
+
+    missing = new_cells == NOT_COMPUTED
+    if missing.any():
+        new_cells[missing] = rule_table[positions[missing], codes[missing]] = rule_f(positions[missing], codes[missing])
+
+    return grid.with_cells(new_cells.astype(grid.cells.dtype).reshape(grid.shape))
+
+
+def create_coord_transition_f(rule_table: np.ndarray, rule_f: COORD_RULE_F_T,
+                              grid: ArrayCellGrid2D) -> TRANSITION_F_T:
+    """
+    wraps a coordinate rule table as a transition function that takes the neighbourhood values followed by
+    the coordinates of the cell, as iterate_ca_once_with_coord_inputs passes them. coordinates wrap around the grid.
+    """
+
+    alphabet = grid.cell_states
+    K = len(alphabet)
+    enumeration = grid.enumeration
+    h, w = grid.shape
+
+    def transition_f(inputs_discrete_values: Sequence[CELL_STATE_T]) -> CELL_STATE_T:
+        neighbour_values, (x, y) = inputs_discrete_values[:-2], inputs_discrete_values[-2:]
+
+        code = 0
+        for v in neighbour_values:
+            code = code * K + enumeration[v]
+
+        position = (y % h) * w + (x % w)
+
+        i = rule_table[position, code]
+        if i == NOT_COMPUTED:
+            i = rule_table[position, code] = rule_f(np.array([position]), np.array([code]))[0]
+
+        return alphabet[i]
+
+    return transition_f
+
+
+def create_coord_iterate_f(rule_table: np.ndarray, rule_f: COORD_RULE_F_T) -> ITERATE_F_T:
+    """
+    like create_iterate_f, for a coordinate rule table
+    """
+
+    def iterate_f(grid: ArrayCellGrid2D, transition_f: TRANSITION_F_T) -> ArrayCellGrid2D:
+        return iterate_ca_once_with_coord_rule_table(grid, rule_table, rule_f)
+
+    return iterate_f
+
+
+def wrapped_coord_inputs(grid: ArrayCellGrid2D, radius: int) -> Sequence[COORD_2D_T]:
+    """
+    for each cell of a toroidal grid, in flat order, the coordinates iterate_ca_once_with_coord_inputs passes for it.
+    that function visits the bounding box padded by the radius, which wraps around onto the grid,
+    so the cells along the edges are visited more than once and end up with the output for the last visit.
+    """
+
+    (x_min, y_min), (x_max, y_max) = grid.get_extreme_coords(pad=radius)
+    h, w = grid.shape
+
+    # the last visit is in the last row, and the last column, that wrap around to the cell
+    last_x = [max(x for x in range(x_min, x_max + 1) if x % w == i) for i in range(w)]
+    last_y = [max(y for y in range(y_min, y_max + 1) if y % h == i) for i in range(h)]
+
+    return tuple((x, y) for y in last_y for x in last_x)
+
+
+def decode_neighbourhood(code: int, alphabet: Sequence[CELL_STATE_T], N: int) -> Tuple[CELL_STATE_T, ...]:
+    K = len(alphabet)
+    digits = []
+    for _ in range(N):
+        code, digit = divmod(code, K)
+        digits.append(alphabet[digit])
+
+    return tuple(reversed(digits))
+
+
+def decode_neighbourhoods(codes: np.ndarray, n_states: int, N: int) -> np.ndarray:
+    """
+    the state indices of the neighbourhoods with the given codes, as a (len(codes) x N) array
+    """
+
+    powers = n_states ** np.arange(N - 1, -1, -1)
+
+    return (codes[:, np.newaxis] // powers) % n_states
+
+
+if __name__ == '__main__':
+    from ca_neat.ca.iterate import iterate_ca_n_times
+    from ca_neat.ga.population import create_initial_population
+    from ca_neat.geometry.cell_grid import ToroidalCellGrid2D
+    from ca_neat.patterns.patterns import SEED_6X6
+    from ca_neat.problems.morphogenesis.generate_border import CA_CONFIG, NEAT_CONFIG
+    from neat.nn import create_feed_forward_phenotype
+
+    for gt in create_initial_population(NEAT_CONFIG):
+        pt = create_feed_forward_phenotype(gt)
+        rule_table = compile_rule_table(pt, CA_CONFIG)
+        transition_f = create_transition_f(rule_table, CA_CONFIG.alphabet)
+
+        assert all(
+            transition_f(decode_neighbourhood(code, CA_CONFIG.alphabet, len(CA_CONFIG.neighbourhood))) ==
+            CA_CONFIG.alphabet[rule_table[code]]
+            for code in range(len(rule_table))
+        )
+
+        dict_grid = ToroidalCellGrid2D(cell_states=CA_CONFIG.alphabet, x_range=(0, 6), y_range=(0, 6),
+                                       neighbourhood=CA_CONFIG.neighbourhood)
+        dict_grid.add_pattern_at_coord(SEED_6X6, (0, 0))
+        array_grid = ToroidalArrayCellGrid2D(cell_states=CA_CONFIG.alphabet, x_range=(0, 6), y_range=(0, 6),
+                                             neighbourhood=CA_CONFIG.neighbourhood)
+        array_grid.add_pattern_at_coord(SEED_6X6, (0, 0))
+
+        for a, b in zip(iterate_ca_n_times(dict_grid, transition_f, 30),
+                        iterate_ca_n_times_with_rule_table(array_grid, rule_table, 30)):
+            assert a.get_whole() == b.get_whole()
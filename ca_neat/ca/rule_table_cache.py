@@ -0,0 +1,192 @@
+import os
+from collections import OrderedDict
+from hashlib import blake2b
+from tempfile import NamedTemporaryFile
+from typing import Dict, Optional
+
+import numpy as np
+from neat.nn import FeedForwardNetwork
+
+from ca_neat.ca.rule_table import compile_rule_table
+from ca_neat.config import CAConfig
+
+# Many genomes of a run (elites, clones, structurally identical offspring) compile to the same rule table.
+# The tables are cached under a canonical digest of the network, which names every node by the digest of
+# everything that determines its value instead of by its ID, so the IDs of the nodes and the disabled genes
+# (which are not part of the phenotype) do not change the key. The links of each node are hashed in order,
+# as that is the order in which serial_activate sums them, so networks with the same key compute the same outputs.
+# Cached tables are read-only, as they are shared by every caller.
+
+# the digest of a node that is linked to but never evaluated, its value stays 0.0
+_UNEVALUATED = b'unevaluated'
+
+
+def network_digest(network: FeedForwardNetwork) -> str:
+    digests: Dict[int, bytes] = dict(
+        (node, 'input {}'.format(i).encode()) for i, node in enumerate(network.input_nodes)
+    )
+
+    for node, f, bias, response, links in network.node_evals:
+        h = blake2b(repr((f.__name__, bias, response)).encode(), digest_size=16)
+        for i, w in links:
+            h.update(digests.get(i, _UNEVALUATED))
+            h.update(repr(w).encode())
+
+        digests[node] = h.digest()
+
+    h = blake2b(digest_size=16)
+    for node in network.output_nodes:
+        h.update(digests.get(node, _UNEVALUATED))
+
+    return h.hexdigest()
+
+
+def rule_table_key(network: FeedForwardNetwork, ca_config: CAConfig, quiescent_stable: bool = True) -> str:
+    """
+    the key of the rule table of a network, which also depends on the states and the size of the neighbourhood
+    """
+
+    settings = repr((tuple(ca_config.alphabet), len(ca_config.neighbourhood), quiescent_stable)).encode()
+
+    return blake2b(network_digest(network).encode() + settings, digest_size=16).hexdigest()
+
+
+class RuleTableCache:
+    """
+    An in-process LRU cache of rule tables, backed by a directory of .npy files when a directory is given.
+    Files are named by their key and written atomically, so any number of processes can share the directory:
+    two processes that compile the same table write the same contents, and readers never see a partial file.
+    Tables are loaded from disk memory mapped, so processes on the same host share their pages.
+    The in-process tier is bounded by the bytes of its tables, as their size grows as K^N.
+    """
+
+    def __init__(self, directory: Optional[str] = None, maxbytes: int = 256 * 2 ** 20) -> None:
+        self.directory = directory
+        self.maxbytes = maxbytes
+        self.nbytes = 0
+        self._tables: Dict[str, np.ndarray] = OrderedDict()
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + '.npy')
+
+    def _remember(self, key: str, rule_table: np.ndarray) -> None:
+        replaced = self._tables.get(key)
+        if replaced is not None:
+            self.nbytes -= replaced.nbytes
+
+        self._tables[key] = rule_table
+        self._tables.move_to_end(key)
+        self.nbytes += rule_table.nbytes
+
+        # a table larger than maxbytes is not kept at all
+        while self.nbytes > self.maxbytes:
+            _, evicted = self._tables.popitem(last=False)
+            self.nbytes -= evicted.nbytes
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        rule_table = self._tables.get(key)
+        if rule_table is not None:
+            self._tables.move_to_end(key)
+            self.hits += 1
+            return rule_table
+
+        if self.directory is not None:
+            try:
+                rule_table = np.load(self._path(key), mmap_mode='r')
+            except (IOError, ValueError):
+                rule_table = None
+
+            if rule_table is not None:
+                self._remember(key, rule_table)
+                self.disk_hits += 1
+                return rule_table
+
+        self.misses += 1
+
+        return None
+
+    def put(self, key: str, rule_table: np.ndarray) -> np.ndarray:
+        rule_table = np.array(rule_table)
+        rule_table.setflags(write=False)
+
+        if self.directory is not None:
+            with NamedTemporaryFile(dir=self.directory, suffix='.tmp', delete=False) as f:
+                np.save(f, rule_table)
+            os.replace(f.name, self._path(key))
+
+        self._remember(key, rule_table)
+
+        return rule_table
+
+    def compile(self, cppn: FeedForwardNetwork, ca_config: CAConfig, quiescent_stable: bool = True) -> np.ndarray:
+        """
+        like compile_rule_table, but only compiles the table if it is not cached yet
+        """
+
+        key = rule_table_key(cppn, ca_config, quiescent_stable)
+
+        rule_table = self.get(key)
+        if rule_table is None:
+            rule_table = self.put(key, compile_rule_table(cppn, ca_config, quiescent_stable))
+
+        return rule_table
+
+
+# one cache for each directory (and one without a directory), for each process
+_caches: Dict[Optional[str], RuleTableCache] = {}
+
+
+def get_rule_table_cache(directory: Optional[str] = None) -> RuleTableCache:
+    cache = _caches.get(directory)
+
+    if cache is None:
+        cache = _caches[directory] = RuleTableCache(directory)
+
+    return cache
+
+
+def compile_rule_table_cached(cppn: FeedForwardNetwork, ca_config: CAConfig,
+                              quiescent_stable: bool = True) -> np.ndarray:
+    """
+    compile_rule_table through the cache of the rule_table_cache_dir of the CA config.
+    the returned table is read-only.
+    """
+
+    return get_rule_table_cache(ca_config.rule_table_cache_dir).compile(cppn, ca_config, quiescent_stable)
+
+
+if __name__ == '__main__':
+    from shutil import rmtree
+    from tempfile import mkdtemp
+    from neat.nn import create_feed_forward_phenotype
+    from ca_neat.ga.population import create_initial_population
+    from ca_neat.problems.morphogenesis.generate_border import CA_CONFIG, NEAT_CONFIG
+
+    directory = mkdtemp()
+
+    try:
+        genomes = list(create_initial_population(NEAT_CONFIG))
+        phenotypes = [create_feed_forward_phenotype(gt) for gt in genomes]
+
+        table_nbytes = compile_rule_table(phenotypes[0], CA_CONFIG).nbytes
+
+        cache = RuleTableCache(directory, maxbytes=4 * table_nbytes)
+        for pt in phenotypes + phenotypes:
+            assert np.array_equal(cache.compile(pt, CA_CONFIG), compile_rule_table(pt, CA_CONFIG))
+            assert cache.nbytes == table_nbytes * len(cache._tables) <= cache.maxbytes
+
+        # a second process only finds the tables on disk
+        other = RuleTableCache(directory)
+        for pt in phenotypes:
+            assert np.array_equal(other.compile(pt, CA_CONFIG), compile_rule_table(pt, CA_CONFIG))
+
+        assert other.misses == 0 and other.disk_hits == len(set(map(network_digest, phenotypes)))
+    finally:
+        rmtree(directory)
@@ -1,5 +1,5 @@
 import random
-from typing import Any, Dict
+from typing import Any, Dict, Optional
 
 from neat.config import Config
 
@@ -64,3 +64,17 @@ class CAConfig:
     initial = None
     etc: Dict[str, Any] = {}
     compute_lambda = False
+
+    # a fitness function with a batch attribute, a function taking a list of phenotypes, evaluates the individuals
+    # in chunks of batch_size
+    batch_size = 200
+
+    # when set, compiled rule tables are also cached in this directory, which the workers of a host share
+    rule_table_cache_dir: Optional[str] = None
+
+    # when set, individuals with the same rule table as an already evaluated individual get its fitness.
+    # problems whose fitness function is stochastic, or uses the CPPN beyond its rule table, must unset it
+    memoize_fitness = True
+
+    # the memo key needs the full rule table, which is not compiled for larger neighbourhood spaces
+    memoize_max_rule_table_size = 2 ** 16
@@ -0,0 +1,78 @@
+from collections import Counter, OrderedDict
+from hashlib import blake2b
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+from ca_neat.config import CAConfig
+
+# the fitness and λ of an individual
+MEMO_ENTRY_T = Tuple[float, Optional[float]]
+
+
+def ca_config_fingerprint(ca_config: CAConfig) -> bytes:
+    """
+    the settings of a CA config that a fitness function may depend on
+    """
+
+    return repr((
+        ca_config.neighbourhood,
+        tuple(ca_config.alphabet),
+        ca_config.geometry,
+        ca_config.iterations,
+        ca_config.initial,
+        sorted(ca_config.etc.items()),
+        ca_config.compute_lambda,
+    )).encode()
+
+
+class FitnessMemo:
+    """
+    Remembers the fitness (and λ) of the individuals evaluated by this process, by the rule table of their CPPN.
+    A fitness function that only uses the CPPN through the states it picks for neighbourhoods, and that is
+    deterministic, gives the same fitness to all CPPNs with the same rule table, whatever their weights.
+    The rule table includes the neighbourhood of only quiescent cells, so it also determines λ.
+    The lookups and hits are counted for each generation of each scenario.
+    """
+
+    def __init__(self, maxsize: int = 2 ** 16) -> None:
+        self.maxsize = maxsize
+        self._entries: Dict[bytes, MEMO_ENTRY_T] = OrderedDict()
+
+        self.lookups: Dict[Tuple[int, int], int] = Counter()
+        self.hits: Dict[Tuple[int, int], int] = Counter()
+
+    @staticmethod
+    def key(rule_table: np.ndarray, fitness_f: Callable, ca_config: CAConfig) -> bytes:
+        h = blake2b(digest_size=16)
+        h.update('{}.{}'.format(fitness_f.__module__, fitness_f.__qualname__).encode())
+        h.update(fitness_f.__code__.co_code)
+        h.update(ca_config_fingerprint(ca_config))
+        h.update(np.ascontiguousarray(rule_table).tobytes())
+
+        return h.digest()
+
+    def get(self, key: bytes, scenario_id: int, generation: int) -> Optional[MEMO_ENTRY_T]:
+        self.lookups[(scenario_id, generation)] += 1
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            self.hits[(scenario_id, generation)] += 1
+
+        return entry
+
+    def put(self, key: bytes, fitness: float, λ: Optional[float]) -> None:
+        self._entries[key] = (fitness, λ)
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def report(self, scenario_id: int, generation: int) -> str:
+        lookups = self.lookups[(scenario_id, generation)]
+        hits = self.hits[(scenario_id, generation)]
+
+        return 'Scenario {}, generation {}: {} of {} fitness evaluations memoized ({:.0%})'.format(
+            scenario_id, generation, hits, lookups, hits / lookups if lookups else 0.0
+        )
@@ -0,0 +1,114 @@
+from typing import Dict, Sequence
+
+import numpy as np
+from neat.genome import Genome
+
+from ca_neat.config import CPPNNEATConfig
+
+# The node and connection genes of a set of genomes, as arrays with a row for each genome and a column for each
+# gene (node ID or connection key) that appears in any of them, with masks of the genes each genome has.
+# The connection columns are sorted by key, so a connection is excess to a genome (its key is greater than all of
+# the keys of that genome) exactly when its column is past the last column of that genome.
+# Distances follow Genome.distance, including its asymmetry: the genome with more connection genes is the one
+# whose connections are classified as excess or disjoint, and the number of its connection genes normalizes them.
+
+
+class GenomeEncoding:
+    def __init__(self, genomes: Sequence[Genome], config: CPPNNEATConfig) -> None:
+        self.config = config
+
+        node_columns = self._columns(sorted(set(k for g in genomes for k in g.node_genes)))
+        conn_columns = self._columns(sorted(set(k for g in genomes for k in g.conn_genes)))
+        activation_codes = self._columns(sorted(set(
+            ng.activation_type for g in genomes for ng in g.node_genes.values()
+        )))
+
+        n = len(genomes)
+
+        self.has_node = np.zeros((n, len(node_columns)), dtype=bool)
+        self.bias = np.zeros((n, len(node_columns)))
+        self.response = np.zeros((n, len(node_columns)))
+        self.activation = np.zeros((n, len(node_columns)), dtype=np.intp)
+
+        self.has_conn = np.zeros((n, len(conn_columns)), dtype=bool)
+        self.weight = np.zeros((n, len(conn_columns)))
+        self.enabled = np.zeros((n, len(conn_columns)), dtype=bool)
+
+        for i, g in enumerate(genomes):
+            for k, ng in g.node_genes.items():
+                c = node_columns[k]
+                self.has_node[i, c] = True
+                self.bias[i, c] = ng.bias
+                self.response[i, c] = ng.response
+                self.activation[i, c] = activation_codes[ng.activation_type]
+
+            for k, cg in g.conn_genes.items():
+                c = conn_columns[k]
+                self.has_conn[i, c] = True
+                self.weight[i, c] = cg.weight
+                self.enabled[i, c] = cg.enabled
+
+        self.n_nodes = self.has_node.sum(axis=1)
+        self.n_conns = self.has_conn.sum(axis=1)
+
+        # the column of the last connection of each genome, -1 for genomes without connections
+        self.conn_column_numbers = np.arange(len(conn_columns))
+        self.last_conn = np.full(n, -1, dtype=np.intp)
+        if conn_columns:
+            self.last_conn = np.where(self.has_conn, self.conn_column_numbers, -1).max(axis=1)
+
+    @staticmethod
+    def _columns(keys: Sequence) -> Dict:
+        return dict((k, c) for c, k in enumerate(keys))
+
+    def distances_to(self, j: int) -> np.ndarray:
+        """
+        the distance of every genome to genome j, as genome.distance(genome_j)
+        """
+
+        ec = self.config.excess_coefficient
+        dc = self.config.disjoint_coefficient
+        wc = self.config.weight_coefficient
+
+        # node genes, which are compared symmetrically
+        common_nodes = self.has_node & self.has_node[j]
+        num_common = common_nodes.sum(axis=1)
+        node_excess = self.n_nodes + self.n_nodes[j] - 2 * num_common
+        activation_diff = (common_nodes & (self.activation != self.activation[j])).sum(axis=1)
+        bias_diff = np.where(common_nodes, np.abs(self.bias - self.bias[j]), 0.0).sum(axis=1)
+        response_diff = np.where(common_nodes, np.abs(self.response - self.response[j]), 0.0).sum(axis=1)
+        most_nodes = np.maximum(self.n_nodes, self.n_nodes[j])
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            distances = (ec * node_excess / most_nodes
+                         + ec * activation_diff / most_nodes
+                         + wc * (bias_diff + response_diff) / num_common)
+
+        # connection genes, genome 1 is the one with more of them (genome j when tied)
+        matching_conns = self.has_conn & self.has_conn[j]
+        matching = matching_conns.sum(axis=1)
+        weight_diff = (np.where(matching_conns, np.abs(self.weight - self.weight[j]), 0.0).sum(axis=1)
+                       + (matching_conns & (self.enabled != self.enabled[j])).sum(axis=1))
+
+        self_is_1 = self.n_conns > self.n_conns[j]
+        n_conns_1 = np.where(self_is_1, self.n_conns, self.n_conns[j])
+        n_conns_2 = np.where(self_is_1, self.n_conns[j], self.n_conns)
+
+        only_in_1 = np.where(
+            self_is_1[:, np.newaxis], self.has_conn & ~self.has_conn[j], self.has_conn[j] & ~self.has_conn
+        )
+        last_conn_2 = np.where(self_is_1, self.last_conn[j], self.last_conn)
+
+        # without connections, genome 2 has no last connection and all of the connections of genome 1 are disjoint
+        past_last_2 = (self.conn_column_numbers > last_conn_2[:, np.newaxis]) & (last_conn_2 >= 0)[:, np.newaxis]
+        excess = (only_in_1 & past_last_2).sum(axis=1)
+        disjoint = only_in_1.sum(axis=1) - excess + n_conns_2 - matching
+
+        # the terms are added one by one, as in Genome.distance, so the rounding is the same
+        has_conns = n_conns_1 > 0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            distances = np.where(has_conns, distances + ec * excess / n_conns_1, distances)
+            distances = np.where(has_conns, distances + dc * disjoint / n_conns_1, distances)
+            distances = np.where(has_conns & (matching > 0), distances + wc * (weight_diff / matching), distances)
+
+        return distances
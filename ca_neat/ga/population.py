@@ -3,10 +3,12 @@ import random
 from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
 from uuid import uuid4
 
+import numpy as np
 from neat.genome import Genome
 from neat.species import Species
 
 from ca_neat.config import CPPNNEATConfig
+from ca_neat.ga.compatibility import GenomeEncoding
 from ca_neat.ga.selection import PAIR_SELECTION_F_T, TooFewIndividuals, random_choice
 
 
@@ -40,21 +42,31 @@ def speciate(genotypes: Sequence[Genome], compatibility_threshold: float,
     if isinstance(existing_species, list):
         species += existing_species
 
-    for individual in genotypes:
-        # Find the species with the most similar representative.
-        min_distance = None
+    genotypes = list(genotypes)
+    n = len(genotypes)
+
+    if n:
+        # the distances of all individuals to a representative are computed at once,
+        # distances[i, k] is the distance of individual i to the representative of the k-th species
+        encoding = GenomeEncoding(genotypes + [s.representative for s in species], genotypes[0].config)
+        distances = np.empty((n, len(species) + n))
+
+        for k in range(len(species)):
+            distances[:, k] = encoding.distances_to(n + k)[:n]
+
+    for i, individual in enumerate(genotypes):
+        # Find the species with the most similar representative, the first one of them if several are as similar.
         closest_species = None
-        for s in species:
-            distance = individual.distance(s.representative)
-            if distance < compatibility_threshold \
-                    and (min_distance is None or distance < min_distance):
-                closest_species = s
-                min_distance = distance
+        if species:
+            k = int(distances[i, :len(species)].argmin())
+            if distances[i, k] < compatibility_threshold:
+                closest_species = species[k]
 
         if closest_species:
             closest_species.add(individual)
         else:
             # No species is similar enough, create a new species for this individual.
+            distances[:, len(species)] = encoding.distances_to(i)[:n]
             species.append(Species(individual, uuid4().int))
 
     # Only keep non-empty species.
@@ -1,4 +1,5 @@
-from operator import attrgetter
+from bisect import bisect_right
+from itertools import accumulate
 from random import choice, random, sample
 from statistics import mean, stdev
 from typing import Callable, Iterator, List, Sequence, Tuple
@@ -13,62 +14,81 @@ class TooFewIndividuals(Exception):
     pass
 
 
-def roulette(population: Sequence[Genome], scaling_func: Callable[[float], float], **kwargs) -> Iterator[PAIR_T]:
+class RouletteWheel:
     """
-    generates pairs with the roulette method.
-    requires a scaling_func to scale the "slices"
+    Selects indices with probabilities proportional to their weights, negative weights counting as zero.
+    A spin bisects the cumulative weights, so it takes O(log n) instead of scanning the slices.
     """
 
-    try:
-        assert len(population) > 1
-    except AssertionError:
-        raise TooFewIndividuals
+    def __init__(self, weights: Sequence[float]) -> None:
+        self.cumulative = list(accumulate(max(0.0, w) for w in weights))
+        self.total = self.cumulative[-1] if self.cumulative else 0.0
+        self.n_positive = sum(w > 0.0 for w in weights)
+
+    def spin(self) -> int:
+        i = bisect_right(self.cumulative, random() * self.total)
 
-    def generate_roulette() -> Callable[[], Genome]:
+        # random() * total can round up to the total
+        return i if i < len(self.cumulative) else self.spin()
+
+    def spin_pairs(self, n: int) -> List[Tuple[int, int]]:
         """
-        returns a function that when called will select an indidividual from the population
-        based on the normalized fitness value as decided by fitness_func
+        n pairs of distinct indices, the second index of a pair is re-spun until it differs from the first
         """
 
-        scaled_fitnesses = list((x.ID, scaling_func(x.fitness)) for x in population)
+        if self.n_positive < 2:
+            raise ValueError('At least two weights must be positive to select distinct pairs')
+
+        pairs = []
+        for _ in range(n):
+            a = b = self.spin()
+
+            while a == b:
+                b = self.spin()
+
+            pairs.append((a, b))
 
-        scaled_fitnesses.sort(key=lambda x: x[1])
+        return pairs
 
-        roulette = dict()
 
-        current_sum = 0.0
-        for id, p in scaled_fitnesses:
-            next_sum = current_sum + p
-            roulette[(current_sum, next_sum)] = id
-            current_sum = next_sum
+def roulette(population: Sequence[Genome], scaling_func: Callable[[float], float], **kwargs) -> Iterator[PAIR_T]:
+    """
+    generates pairs with the roulette method.
+    requires a scaling_func to scale the "slices"
+    """
 
-        sorted_by_lower_bound = sorted(roulette.keys(), key=lambda x: x[0])
+    try:
+        assert len(population) > 1
+    except AssertionError:
+        raise TooFewIndividuals
 
-        def get_one() -> Genome:
-            r = random()
+    return weighted_roulette(population, [scaling_func(x.fitness) for x in population])
 
-            for (lo, hi) in sorted_by_lower_bound:
-                if lo <= r < hi:
-                    return roulette[(lo, hi)]
 
-        return get_one
+def weighted_roulette(population: Sequence[Genome], weights: Sequence[float]) -> Iterator[PAIR_T]:
+    """
+    generates pairs with the roulette method, with a slice of the given weight for each individual
+    """
 
-    spin = generate_roulette()
+    wheel = RouletteWheel(weights)
 
-    individuals_by_id = {x.ID: x for x in population}
+    # distinct pairs can only be selected if at least two slices are not empty
+    if wheel.n_positive < 2:
+        raise TooFewIndividuals
 
-    while True:
-        a = b = spin()
+    return _spin_pairs(population, wheel)
 
-        while a == b:
-            b = spin()
 
-        yield (individuals_by_id.get(a), individuals_by_id.get(b))
+def _spin_pairs(population: Sequence[Genome], wheel: RouletteWheel) -> Iterator[PAIR_T]:
+    # the pairs are drawn in batches of one pair per individual, about what a species spawns
+    while True:
+        for a, b in wheel.spin_pairs(len(population)):
+            yield (population[a], population[b])
 
 
 def fitness_proportionate(population: List[Genome], **kwargs) -> Iterator[PAIR_T]:
-    total_fitness = sum(x.fitness for x in population)
-    scaling_func = lambda fitness: fitness / total_fitness
+    # the wheel normalizes the slices itself
+    scaling_func = lambda fitness: fitness
 
     return roulette(population=population, scaling_func=scaling_func, **kwargs)
 
@@ -90,46 +110,113 @@ def sigma_scaled(population: List[Genome], **kwargs) -> Iterator[PAIR_T]:
 
     average_fitness = mean(fitnesses)
     expected_value_func = lambda x: 1 if sigma == 0 else 1 + ((x - average_fitness) / (2 * sigma))
-    sigma_sum = sum(expected_value_func(x) for x in fitnesses)
-    scaling_func = lambda x: expected_value_func(x) / sigma_sum
 
-    return roulette(population=population, scaling_func=scaling_func, **kwargs)
+    # the wheel normalizes the slices itself, and gives none to individuals more than two sigmas below the average
+    return roulette(population=population, scaling_func=expected_value_func, **kwargs)
 
 
-def ranked(population: List[Genome], **kwargs) -> Iterator[PAIR_T]:
-    min_f = min(population, key=attrgetter('fitness'))
-    max_f = max(population, key=attrgetter('fitness'))
-    sorted_population = sorted(population, key=attrgetter('fitness'), reverse=True)
-    scaling_func = lambda x: min_f + (max_f - min_f) * sorted_population.index(x) / (len(population) - 1)
+def _ranks(population: Sequence[Genome]) -> List[int]:
+    # the rank of each individual, 0 for the least fit, individuals with the same fitness keep their order
+    order = sorted(range(len(population)), key=lambda i: population[i].fitness)
 
-    return roulette(population=population, scaling_func=scaling_func, **kwargs)
+    ranks = [0] * len(population)
+    for rank, i in enumerate(order):
+        ranks[i] = rank
+
+    return ranks
+
+
+def ranked(population: List[Genome], selection_pressure: float = 1.5, **kwargs) -> Iterator[PAIR_T]:
+    """
+    linear ranking, the slice of an individual grows linearly with its rank.
+    the fittest individual is expected to be selected selection_pressure times (between 1.0 and 2.0)
+    and the least fit 2.0 - selection_pressure times, out of n selections.
+    use functools.partial to set the selection pressure of a pair_selection_f.
+    """
+
+    try:
+        assert len(population) > 1
+    except AssertionError:
+        raise TooFewIndividuals
+
+    if not 1.0 <= selection_pressure <= 2.0:
+        raise ValueError('The selection pressure of linear ranking must be between 1.0 and 2.0')
+
+    n = len(population)
+    weights = [(2.0 - selection_pressure) + 2.0 * (selection_pressure - 1.0) * rank / (n - 1)
+               for rank in _ranks(population)]
+
+    return weighted_roulette(population, weights)
+
+
+def exponential_ranked(population: List[Genome], c: float = 0.99, **kwargs) -> Iterator[PAIR_T]:
+    """
+    exponential ranking, the slice of an individual is c times the slice of the next fitter one (0 < c < 1).
+    the smaller c, the higher the selection pressure.
+    """
+
+    try:
+        assert len(population) > 1
+    except AssertionError:
+        raise TooFewIndividuals
+
+    if not 0.0 < c < 1.0:
+        raise ValueError('The base of exponential ranking must be between 0.0 and 1.0')
+
+    n = len(population)
+    weights = [c ** (n - 1 - rank) for rank in _ranks(population)]
+
+    return weighted_roulette(population, weights)
+
+
+def tournament_pairs(fitnesses: Sequence[float], group_size: int, epsilon: float, k: int) -> List[Tuple[int, int]]:
+    """
+    k pairs of distinct indices, each chosen by a tournament among group_size random individuals,
+    which the fittest wins, or with probability epsilon a random member of the group.
+    the second tournament of a pair is held among the individuals other than the first winner.
+    fitnesses can be any indexable sequence, such as a numpy array.
+    """
 
+    n = len(fitnesses)
 
-def tournament(population: List[Genome], group_size: int, epsilon: float, **kwargs) -> Iterator[PAIR_T]:
-    def get_one(group: Sequence[Genome]) -> Genome:
+    def get_one(group: Sequence[int]) -> int:
         r = random()
 
         if r < epsilon:
             return choice(group)
 
-        return max(group, key=attrgetter('fitness'))
+        return max(group, key=fitnesses.__getitem__)
+
+    pairs = []
+    for _ in range(k):
+        a = get_one(sample(range(n), group_size))
+
+        # the indices of the other individuals, shifted past the first winner
+        b = get_one([i + (i >= a) for i in sample(range(n - 1), group_size)])
+
+        pairs.append((a, b))
 
+    return pairs
+
+
+def tournament(population: List[Genome], group_size: int = 2, epsilon: float = 0.0, **kwargs) -> Iterator[PAIR_T]:
     try:
         assert len(population) > 1
     except AssertionError:
         raise TooFewIndividuals
 
-    while True:
-        pool = list(population)  # make a shallow copy
+    fitnesses = [x.fitness for x in population]
 
-        group_a = sample(pool, group_size)
-        a = get_one(group_a)
-        pool.remove(a)
+    # the second tournament of a pair has one individual less to choose from
+    group_size = min(group_size, len(population) - 1)
 
-        group_b = sample(pool, group_size)
-        b = get_one(group_b)
+    def generate_pairs() -> Iterator[PAIR_T]:
+        # the pairs are drawn in batches of one pair per individual, about what a species spawns
+        while True:
+            for a, b in tournament_pairs(fitnesses, group_size, epsilon, len(population)):
+                yield (population[a], population[b])
 
-        yield (a, b)
+    return generate_pairs()
 
 
 def random_choice(population: List[Genome], **kwargs) -> Iterator[PAIR_T]:
@@ -0,0 +1,300 @@
+from hashlib import blake2b
+from typing import Callable, Dict, Iterator, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ca_neat.geometry.cell_grid import CELL_STATE_T
+from ca_neat.geometry.neighbourhoods import COORD_2D_T, NEIHGBOURHOOD_2D_T, VON_NEUMANN
+
+
+class ArrayCellGrid2D:
+    """
+    A finite 2D grid where the cells are stored as a dense array of indices into cell_states.
+    Offers the same public API as FiniteCellGrid2D, so it can be used as a drop-in replacement,
+    but the cell values can also be accessed as a whole through the cells attribute.
+    """
+
+    dimensionality: int = 2
+    neighbourhood: NEIHGBOURHOOD_2D_T = VON_NEUMANN
+    origin: COORD_2D_T = (0, 0)
+
+    def __init__(self, cell_states: Sequence[CELL_STATE_T], x_range: Tuple[int, int], y_range: Tuple[int, int],
+                 values: Optional[Dict[COORD_2D_T, CELL_STATE_T]] = None, neighbourhood: NEIHGBOURHOOD_2D_T = None,
+                 cells: Optional[np.ndarray] = None) -> None:
+        self.cell_states: Sequence[CELL_STATE_T] = cell_states
+        self.dead_cell: CELL_STATE_T = cell_states[0]
+        self.enumeration: Dict[CELL_STATE_T, int] = dict((v, k) for k, v in enumerate(cell_states))
+        self.x_range = x_range
+        self.y_range = y_range
+
+        if cells is None:
+            cells = np.zeros(self.shape, dtype=np.uint8)
+
+        assert cells.shape == self.shape
+
+        self.cells: np.ndarray = cells
+
+        if values:
+            for key, value in values.items():
+                self.set(key, value)
+
+        if neighbourhood:
+            self.neighbourhood = neighbourhood
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        l, r = self.x_range
+        t, b = self.y_range
+
+        return b - t, r - l
+
+    @property
+    def area(self) -> int:
+        h, w = self.shape
+
+        return max(w, 1) * max(h, 1)
+
+    def is_coord_within_bounds(self, coord: COORD_2D_T) -> bool:
+        x, y = coord
+        l, r = self.x_range
+        t, b = self.y_range
+
+        return (l <= x < r) and (t <= y < b)
+
+    def get_array_index(self, coord: COORD_2D_T) -> Tuple[int, int]:
+        x, y = coord
+        l, _ = self.x_range
+        t, _ = self.y_range
+
+        return y - t, x - l
+
+    def get(self, coord: COORD_2D_T, default: Optional[CELL_STATE_T] = None) -> CELL_STATE_T:
+        if not self.is_coord_within_bounds(coord):
+            return default or self.dead_cell
+
+        return self.cell_states[self.cells[self.get_array_index(coord)]]
+
+    def set(self, coord: COORD_2D_T, value: CELL_STATE_T) -> None:
+        if not self.is_coord_within_bounds(coord):
+            return
+
+        self.cells[self.get_array_index(coord)] = self.enumeration[value]
+
+    def get_neighbourhood_values(self, coord: COORD_2D_T) -> Sequence[CELL_STATE_T]:
+        x, y = coord
+
+        return tuple(self.get((x + dx, y + dy)) for (dx, dy) in self.neighbourhood)
+
+    def get_extreme_coords(self, pad: int = 0) -> Tuple[COORD_2D_T, COORD_2D_T]:
+        x_min, x_max = self.x_range
+        y_min, y_max = self.y_range
+
+        return (x_min - pad, y_min - pad), (x_max + pad, y_max + pad)
+
+    def iterate_coords(self) -> Iterator[COORD_2D_T]:
+        l, r = self.x_range
+        t, b = self.y_range
+
+        for y in range(t, b):
+            for x in range(l, r):
+                yield (x, y)
+
+    def get_live_cells(self) -> Iterator[Tuple[COORD_2D_T, CELL_STATE_T]]:
+        l, _ = self.x_range
+        t, _ = self.y_range
+
+        for (y, x) in zip(*np.nonzero(self.cells)):
+            yield (int(x) + l, int(y) + t), self.cell_states[self.cells[y, x]]
+
+    def get_rectangle(self, x_range: Tuple[int, int], y_range: Tuple[int, int],
+                      f: Optional[Callable[..., CELL_STATE_T]] = None) -> Sequence[Sequence[CELL_STATE_T]]:
+        l, r = x_range
+        t, b = y_range
+
+        if f is None:
+            f = lambda x: x
+
+        return tuple(
+            tuple(
+                f(
+                    self.get((x, y))
+                )
+                for x in range(l, r)
+            ) for y in range(t, b)
+        )
+
+    def get_enumerated_rectangle(self, x_range: Tuple[int, int], y_range: Tuple[int, int]):
+        return self.get_rectangle(x_range, y_range, f=self.enumeration.get)
+
+    def get_whole(self, f: Optional[Callable[..., CELL_STATE_T]] = None) -> Sequence[Sequence[CELL_STATE_T]]:
+        cell_states = self.cell_states
+
+        if f is None:
+            return tuple(tuple(cell_states[i] for i in row) for row in self.cells.tolist())
+        else:
+            return tuple(tuple(f(cell_states[i]) for i in row) for row in self.cells.tolist())
+
+    def get_enumerated_whole(self) -> Sequence[Sequence[int]]:
+        return tuple(tuple(row) for row in self.cells.tolist())
+
+    def encode_pattern(self, pattern: Sequence[Sequence[CELL_STATE_T]]) -> np.ndarray:
+        enumeration = self.enumeration
+
+        return np.array([[enumeration[value] for value in row] for row in pattern], dtype=self.cells.dtype)
+
+    def add_pattern_at_coord(self, pattern: Sequence[Sequence[CELL_STATE_T]], coord: COORD_2D_T) -> None:
+        encoded = self.encode_pattern(pattern)
+
+        if not encoded.size:
+            return
+
+        pattern_h, pattern_w = encoded.shape
+        h, w = self.shape
+        y0, x0 = self.get_array_index(coord)
+
+        # clip the pattern to the part that lies within the grid, cells outside of a finite grid are discarded
+        top, left = max(0, -y0), max(0, -x0)
+        bottom, right = min(pattern_h, h - y0), min(pattern_w, w - x0)
+
+        if top >= bottom or left >= right:
+            return
+
+        self.cells[y0 + top:y0 + bottom, x0 + left:x0 + right] = encoded[top:bottom, left:right]
+
+    def empty_copy(self):
+        new = self.__class__(cell_states=self.cell_states, x_range=self.x_range, y_range=self.y_range)
+        new.neighbourhood = self.neighbourhood
+        return new
+
+    def with_cells(self, cells: np.ndarray):
+        """
+        returns a grid with the same geometry as this one, backed by the given array of state indices
+        """
+
+        new = self.__class__(cell_states=self.cell_states, x_range=self.x_range, y_range=self.y_range, cells=cells)
+        new.neighbourhood = self.neighbourhood
+        return new
+
+    def copy(self):
+        return self.with_cells(self.cells.copy())
+
+    def __eq__(self, other) -> bool:
+        if self.__class__ != other.__class__:
+            return False
+
+        if self.x_range != other.x_range or self.y_range != other.y_range:
+            return False
+
+        return np.array_equal(self.cells, other.cells)
+
+    def __hash__(self) -> int:
+        return hash((self.shape, self.cells.tobytes()))
+
+    def fingerprint(self) -> int:
+        """
+        a 64 bit digest of the packed cell buffer
+        """
+
+        digest = blake2b(self.cells.tobytes(), digest_size=8, key=repr(self.shape).encode()).digest()
+
+        return int.from_bytes(digest, 'little')
+
+    def __str__(self) -> str:
+        s = ''
+        t, _ = self.y_range
+        for y, row in enumerate(self.get_whole()):
+            s += '{}\t|'.format(t + y)
+            for v in row:
+                s += ' ' if v == self.dead_cell else str(v)
+            s += '|\n'
+
+        return s
+
+
+class ToroidalArrayCellGrid2D(ArrayCellGrid2D):
+    """
+    Array backed equivalent of ToroidalCellGrid2D, coordinates outside of the grid wrap around.
+    """
+
+    def __init__(self, cell_states: Sequence[CELL_STATE_T], x_range: Tuple[int, int], y_range: Tuple[int, int],
+                 values: Optional[Dict[COORD_2D_T, CELL_STATE_T]] = None, neighbourhood: NEIHGBOURHOOD_2D_T = None,
+                 cells: Optional[np.ndarray] = None) -> None:
+        x0, x1 = x_range
+        y0, y1 = y_range
+
+        assert x0 == 0
+        assert y0 == 0
+
+        super().__init__(
+            cell_states=cell_states,
+            x_range=x_range,
+            y_range=y_range,
+            values=values,
+            neighbourhood=neighbourhood,
+            cells=cells,
+        )
+
+    def get_absolute_coord(self, coord: COORD_2D_T) -> COORD_2D_T:
+        x, y = coord
+        l, r = self.x_range
+        t, b = self.y_range
+
+        return x % r, y % b
+
+    def set(self, coord: COORD_2D_T, value: CELL_STATE_T) -> None:
+        super().set(self.get_absolute_coord(coord), value)
+
+    def get(self, coord: COORD_2D_T, default: Optional[CELL_STATE_T] = None) -> CELL_STATE_T:
+        return super().get(self.get_absolute_coord(coord), default=default)
+
+    def add_pattern_at_coord(self, pattern: Sequence[Sequence[CELL_STATE_T]], coord: COORD_2D_T) -> None:
+        encoded = self.encode_pattern(pattern)
+
+        if not encoded.size:
+            return
+
+        pattern_h, pattern_w = encoded.shape
+        h, w = self.shape
+        x0, y0 = self.get_absolute_coord(coord)
+
+        ys = (np.arange(pattern_h) + y0) % h
+        xs = (np.arange(pattern_w) + x0) % w
+
+        self.cells[np.ix_(ys, xs)] = encoded
+
+    def get_rotation(self, k: int = 1):
+        return self.with_cells(np.ascontiguousarray(np.rot90(self.cells, k=k)))
+
+    def get_fliplr(self):
+        return self.with_cells(np.ascontiguousarray(np.fliplr(self.cells)))
+
+    def get_flipud(self):
+        return self.with_cells(np.ascontiguousarray(np.flipud(self.cells)))
+
+
+if __name__ == '__main__':
+    from ca_neat.geometry.cell_grid import ToroidalCellGrid2D, get_rotational_hash
+
+    pattern = (
+        ('1', '0', '1', '1', '0'),
+        ('1', '0', '1', '0', '1'),
+        ('1', '0', '1', '0', '1'),
+        ('1', '0', '1', '0', '1'),
+        ('1', '0', '1', '1', '0'),
+    )
+
+    dict_grid = ToroidalCellGrid2D(cell_states='01', x_range=(0, 5), y_range=(0, 5))
+    dict_grid.add_pattern_at_coord(pattern, (2, 3))
+
+    array_grid = ToroidalArrayCellGrid2D(cell_states='01', x_range=(0, 5), y_range=(0, 5))
+    array_grid.add_pattern_at_coord(pattern, (2, 3))
+
+    assert array_grid.get_whole() == dict_grid.get_whole()
+    assert array_grid.get_enumerated_whole() == dict_grid.get_enumerated_whole()
+    assert all(
+        array_grid.get_neighbourhood_values(coord) == dict_grid.get_neighbourhood_values(coord)
+        for coord in dict_grid.iterate_coords()
+    )
+    assert get_rotational_hash(array_grid) == get_rotational_hash(array_grid.get_rotation())
+    assert array_grid == array_grid.copy() and hash(array_grid) == hash(array_grid.copy())
+    assert array_grid != array_grid.empty_copy()
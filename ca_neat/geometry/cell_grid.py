@@ -1,12 +1,14 @@
 from collections import defaultdict
+from hashlib import blake2b
 from operator import itemgetter
-from typing import Callable, Dict, Iterator, Optional, Sequence, Tuple, Union
+from typing import Callable, Dict, Iterator, Optional, Sequence, Set, Tuple, Union
 
 from numpy.lib.function_base import rot90
 from numpy.lib.twodim_base import fliplr, flipud
 
 from ca_neat.geometry.neighbourhoods import (COORD_1D_T, COORD_2D_T, COORD_T, LCR, NEIHGBOURHOOD_1D_T,
-                                             NEIHGBOURHOOD_2D_T, NEIHGBOURHOOD_T, VON_NEUMANN, radius_1d, radius_2d)
+                                             NEIHGBOURHOOD_2D_T, NEIHGBOURHOOD_T, VON_NEUMANN, radius_1d, radius_2d,
+                                             wrapped_neighbour_coords)
 from ca_neat.utils import tuple_add
 
 CELL_STATE_T = Union[str, int]
@@ -16,6 +18,9 @@ class CellGrid(defaultdict):
     dimensionality: int = None
     neighbourhood: NEIHGBOURHOOD_T = None
     origin: COORD_T = None
+    # the coords whose state changed in the step that produced this grid, None if unknown.
+    # set by iterate_ca_once_incremental, grids created or modified in any other way leave it as None.
+    changed_coords: Optional[Set[COORD_T]] = None
 
     def __init__(self, cell_states: Sequence[CELL_STATE_T], values: Optional[Dict[COORD_T, CELL_STATE_T]] = None,
                  neighbourhood: NEIHGBOURHOOD_T = None) -> None:
@@ -84,6 +89,15 @@ class CellGrid(defaultdict):
     def __hash__(self) -> int:
         return hash(tuple(self.get_live_cells()))
 
+    def fingerprint(self) -> int:
+        """
+        a 64 bit digest of the live cells that, unlike __hash__, does not depend on the order the cells were set in
+        """
+
+        live_cells = sorted(self.get_live_cells())
+
+        return int.from_bytes(blake2b(repr(live_cells).encode(), digest_size=8).digest(), 'little')
+
 
 class CellGrid1D(CellGrid):
     dimensionality: int = 1
@@ -345,6 +359,17 @@ class ToroidalCellGrid2D(FiniteCellGrid2D):
     def get(self, coord: COORD_2D_T, default: Optional[CELL_STATE_T] = None):
         return super().get(self.get_absolute_coord(coord), default=default)
 
+    def get_neighbourhood_values(self, coord: COORD_2D_T) -> Sequence[CELL_STATE_T]:
+        x, y = self.get_absolute_coord(coord)
+        _, r = self.x_range
+        _, b = self.y_range
+
+        neighbours = wrapped_neighbour_coords((b, r), tuple(self.neighbourhood))[y * r + x]
+        dead_cell = self.dead_cell
+        get = dict.get
+
+        return tuple(get(self, neighbour, dead_cell) for neighbour in neighbours)
+
     def get_rotation(self, k: int = 1):
         copy = self.empty_copy()
 
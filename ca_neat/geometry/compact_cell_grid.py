@@ -0,0 +1,182 @@
+from hashlib import blake2b
+from operator import itemgetter
+from typing import Callable, Dict, Iterator, Optional, Sequence, Set, Tuple
+
+from ca_neat.geometry.cell_grid import CELL_STATE_T
+from ca_neat.geometry.neighbourhoods import COORD_2D_T, NEIHGBOURHOOD_2D_T, VON_NEUMANN, radius_2d
+
+
+class CompactCellGrid2D(dict):
+    """
+    An unbounded 2D grid like CellGrid2D, where each cell is stored as the index of its state in cell_states.
+    get, set and get_neighbourhood_values work on indices and do not validate anything, as they are used when stepping,
+    so transition functions used with this grid take and return indices, the dead cell being 0.
+    States are validated and encoded at the boundary, by add_pattern_at_coord,
+    and decoded again by get_rectangle and get_live_cells.
+    With debug set, every call to set is validated as well.
+    """
+
+    __slots__ = ('cell_states', 'dead_cell', 'enumeration', 'neighbourhood', 'debug', 'changed_coords')
+
+    dimensionality: int = 2
+    origin: COORD_2D_T = (0, 0)
+
+    def __init__(self, cell_states: Sequence[CELL_STATE_T], values: Optional[Dict[COORD_2D_T, CELL_STATE_T]] = None,
+                 neighbourhood: NEIHGBOURHOOD_2D_T = None, debug: bool = False) -> None:
+        super().__init__()
+
+        self.cell_states: Sequence[CELL_STATE_T] = cell_states
+        self.dead_cell: CELL_STATE_T = cell_states[0]
+        self.enumeration: Dict[CELL_STATE_T, int] = dict((v, k) for k, v in enumerate(cell_states))
+        self.neighbourhood: NEIHGBOURHOOD_2D_T = neighbourhood or VON_NEUMANN
+        self.debug = debug
+        # see CellGrid.changed_coords
+        self.changed_coords: Optional[Set[COORD_2D_T]] = None
+
+        if values:
+            for key, value in values.items():
+                self.set(key, self.encode(value))
+
+    def encode(self, value: CELL_STATE_T) -> int:
+        try:
+            return self.enumeration[value]
+        except KeyError:
+            raise ValueError('{!r} is not one of the cell states {!r}'.format(value, self.cell_states))
+
+    def get(self, coord: COORD_2D_T, default: int = 0) -> int:
+        return dict.get(self, coord, default)
+
+    def set(self, coord: COORD_2D_T, value: int) -> None:
+        if self.debug:
+            assert len(coord) == self.dimensionality
+            assert 0 <= value < len(self.cell_states)
+
+        if value == 0 and coord != self.origin:
+            self.pop(coord, None)
+            return
+
+        self[coord] = value
+
+    def get_neighbourhood_values(self, coord: COORD_2D_T) -> Sequence[int]:
+        x, y = coord
+        get = dict.get
+
+        return tuple(get(self, (x + dx, y + dy), 0) for (dx, dy) in self.neighbourhood)
+
+    def empty_copy(self):
+        return self.__class__(cell_states=self.cell_states, neighbourhood=self.neighbourhood, debug=self.debug)
+
+    def get_extreme_coords(self, pad: int = 0) -> Tuple[COORD_2D_T, COORD_2D_T]:
+        xs = tuple(map(itemgetter(0), self.keys()))
+        ys = tuple(map(itemgetter(1), self.keys()))
+
+        return (min(xs) - pad, min(ys) - pad), (max(xs) + pad, max(ys) + pad)
+
+    @property
+    def area(self) -> int:
+        (x_min, y_min), (x_max, y_max) = self.get_extreme_coords()
+
+        return max(abs(x_max - x_min), 1) * max(abs(y_max - y_min), 1)
+
+    def iterate_coords(self) -> Iterator[COORD_2D_T]:
+        (x_min, y_min), (x_max, y_max) = self.get_extreme_coords(pad=radius_2d(self.neighbourhood))
+
+        for y in range(y_min, y_max + 1):
+            for x in range(x_min, x_max + 1):
+                yield (x, y)
+
+    def get_live_cells(self) -> Iterator[Tuple[COORD_2D_T, CELL_STATE_T]]:
+        cell_states = self.cell_states
+
+        return ((coord, cell_states[i]) for (coord, i) in self.items() if i != 0)
+
+    def get_rectangle(self, x_range: Tuple[int, int], y_range: Tuple[int, int],
+                      f: Optional[Callable[..., CELL_STATE_T]] = None) -> Sequence[Sequence[CELL_STATE_T]]:
+        cell_states = self.cell_states
+
+        if f is None:
+            f = lambda x: x
+
+        return tuple(
+            tuple(f(cell_states[i]) for i in row)
+            for row in self.get_enumerated_rectangle(x_range, y_range)
+        )
+
+    def get_enumerated_rectangle(self, x_range: Tuple[int, int], y_range: Tuple[int, int]) -> Sequence[Sequence[int]]:
+        l, r = x_range
+        t, b = y_range
+        get = dict.get
+
+        return tuple(
+            tuple(get(self, (x, y), 0) for x in range(l, r))
+            for y in range(t, b)
+        )
+
+    def add_pattern_at_coord(self, pattern: Sequence[Sequence[CELL_STATE_T]], coord: COORD_2D_T) -> None:
+        start_x, start_y = coord
+
+        for y, row in enumerate(pattern):
+            for x, value in enumerate(row):
+                self.set((start_x + x, start_y + y), self.encode(value))
+
+    def __eq__(self, other) -> bool:
+        if self.__class__ != other.__class__:
+            return False
+
+        return dict.__eq__(self, other)
+
+    def __ne__(self, other) -> bool:
+        return not self == other
+
+    def __hash__(self) -> int:
+        return hash(frozenset((coord, i) for (coord, i) in self.items() if i != 0))
+
+    def fingerprint(self) -> int:
+        """
+        a 64 bit digest of the live cells, see CellGrid.fingerprint
+        """
+
+        live_cells = sorted((coord, i) for (coord, i) in self.items() if i != 0)
+
+        return int.from_bytes(blake2b(repr(live_cells).encode(), digest_size=8).digest(), 'little')
+
+    def __str__(self) -> str:
+        (x_min, y_min), (x_max, y_max) = self.get_extreme_coords()
+
+        s = ''
+        for y in range(y_min, y_max):
+            s += '{}\t|'.format(y)
+            for x in range(x_min, x_max):
+                i = self.get((x, y))
+                s += ' ' if i == 0 else str(self.cell_states[i])
+            s += '|\n'
+
+        return s
+
+
+if __name__ == '__main__':
+    from ca_neat.geometry.cell_grid import CellGrid2D
+
+    pattern = (
+        ('1', '0', '1', '1', '0'),
+        ('1', '0', '1', '0', '1'),
+        ('1', '2', '1', '0', '1'),
+    )
+
+    grid = CellGrid2D(cell_states='012')
+    grid.add_pattern_at_coord(pattern, (-2, 3))
+
+    compact = CompactCellGrid2D(cell_states='012')
+    compact.add_pattern_at_coord(pattern, (-2, 3))
+
+    assert compact.get_rectangle((-3, 4), (2, 7)) == grid.get_rectangle((-3, 4), (2, 7))
+    assert compact.get_extreme_coords(pad=1) == grid.get_extreme_coords(pad=1)
+    assert sorted(compact.get_live_cells()) == sorted(grid.get_live_cells())
+    assert compact.get_neighbourhood_values((0, 4)) == tuple(map(compact.enumeration.get,
+                                                                 grid.get_neighbourhood_values((0, 4))))
+
+    try:
+        compact.add_pattern_at_coord((('3',),), (0, 0))
+        assert False
+    except ValueError:
+        pass
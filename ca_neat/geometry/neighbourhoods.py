@@ -1,6 +1,9 @@
+from functools import lru_cache
 from operator import itemgetter
 from typing import Sequence, Tuple, Union
 
+import numpy as np
+
 COORD_1D_T = Tuple[int]
 COORD_2D_T = Tuple[int, int]
 COORD_T = Union[COORD_1D_T, COORD_2D_T]
@@ -72,6 +75,44 @@ def moore(r=1):
 
 MOORE = moore(1)
 
+
+@lru_cache(maxsize=None)
+def wrapped_neighbour_indices(shape: Tuple[int, ...], neighbourhood: NEIHGBOURHOOD_T) -> np.ndarray:
+    """
+    the flat index of each neighbour of each cell of a toroidal grid,
+    as an array of shape (cells, len(neighbourhood)).
+    the axes of shape are ordered (y, x) like the cell arrays,
+    while the offsets of the neighbourhood are ordered (x, y).
+    cached, as the problems step grids of the same few shapes over and over again.
+    """
+
+    axes = tuple(range(len(shape)))
+    cells = np.arange(int(np.prod(shape))).reshape(shape)
+
+    indices = np.stack([
+        np.roll(cells, shift=tuple(-o for o in reversed(offset)), axis=axes).ravel()
+        for offset in neighbourhood
+    ], axis=1)
+    indices.flags.writeable = False
+
+    return indices
+
+
+@lru_cache(maxsize=None)
+def wrapped_neighbour_coords(shape: Tuple[int, int], neighbourhood: NEIHGBOURHOOD_2D_T) \
+        -> Sequence[Sequence[COORD_2D_T]]:
+    """
+    the coordinates of each neighbour of each cell of a toroidal 2D grid, indexed like wrapped_neighbour_indices
+    """
+
+    _, w = shape
+
+    return tuple(
+        tuple((int(i) % w, int(i) // w) for i in row)
+        for row in wrapped_neighbour_indices(shape, neighbourhood)
+    )
+
+
 if __name__ == '__main__':
     assert one_d_neighborhood(1) == LCR == ((-1,), (0,), (1,))
     assert one_d_neighborhood(3) == LLLCRRR == ((-3,), (-2,), (-1,), (0,), (1,), (2,), (3,))
@@ -0,0 +1,173 @@
+import math
+from typing import Callable, Dict, Sequence, Tuple
+
+import numpy as np
+from neat import activations
+from neat.genome import Genome
+from neat.nn import FeedForwardNetwork
+
+from ca_neat.nn.prune import create_pruned_feed_forward_phenotype
+
+# Numpy equivalents of the activation functions of neat, applied to a whole column of a batch at once.
+# Each one gives the same values as the scalar function, including for inf and nan, so min(60.0, z) becomes
+# np.where(z < 60.0, z, 60.0) rather than np.clip, which would let nan through where min does not.
+# Each returns the activated values and a mask of the rows for which the scalar function raises OverflowError.
+BATCH_ACTIVATION_F_T = Callable[[np.ndarray], Tuple[np.ndarray, np.ndarray]]
+
+
+def _clamp(z: np.ndarray, lo: float, hi: float) -> np.ndarray:
+    # max(lo, min(hi, z))
+    z = np.where(z < hi, z, hi)
+    return np.where(z > lo, z, lo)
+
+
+def _no_overflow(z: np.ndarray, values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    return values, np.zeros(len(z), dtype=bool)
+
+
+def _power(z: np.ndarray, exponent: float) -> Tuple[np.ndarray, np.ndarray]:
+    # z ** exponent raises OverflowError when the result of a finite z is too large for a float
+    values = np.power(z, exponent)
+    return values, np.isfinite(z) & ~np.isfinite(values)
+
+
+def _inv(z: np.ndarray) -> np.ndarray:
+    nonzero = z != 0
+    return np.where(nonzero, 1.0 / np.where(nonzero, z, 1.0), 0.0)
+
+
+def _hat(z: np.ndarray) -> np.ndarray:
+    t = 1 - np.abs(z)
+    return np.where(t > 0.0, t, 0.0)
+
+
+BATCH_ACTIVATIONS: Dict[Callable[[float], float], BATCH_ACTIVATION_F_T] = {
+    activations.sigmoid_activation: lambda z: _no_overflow(z, 1.0 / (1.0 + np.exp(-_clamp(z, -60.0, 60.0)))),
+    activations.tanh_activation: lambda z: _no_overflow(z, np.tanh(_clamp(z, -60.0, 60.0))),
+    activations.sin_activation: lambda z: _no_overflow(z, np.sin(_clamp(z, -60.0, 60.0))),
+    activations.gauss_activation: lambda z: _no_overflow(
+        z, np.exp(-0.5 * np.power(_clamp(z, -60.0, 60.0), 2.0)) / math.sqrt(2 * math.pi)
+    ),
+    activations.relu_activation: lambda z: _no_overflow(z, np.where(z > 0.0, z, 0.0)),
+    activations.identity_activation: lambda z: _no_overflow(z, z),
+    activations.clamped_activation: lambda z: _no_overflow(z, _clamp(z, -1.0, 1.0)),
+    activations.inv_activation: lambda z: _no_overflow(z, _inv(z)),
+    activations.log_activation: lambda z: _no_overflow(z, np.log(np.where(z > 1e-7, z, 1e-7))),
+    activations.exp_activation: lambda z: _no_overflow(z, np.exp(_clamp(z, -60.0, 60.0))),
+    activations.abs_activation: lambda z: _no_overflow(z, np.abs(z)),
+    activations.hat_activation: lambda z: _no_overflow(z, _hat(z)),
+    activations.square_activation: lambda z: _power(z, 2.0),
+    activations.cube_activation: lambda z: _power(z, 3.0),
+}
+
+
+def _scalar_activation(f: Callable[[float], float]) -> BATCH_ACTIVATION_F_T:
+    # any other activation function is applied one value at a time
+    def batch_f(z: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        values = np.zeros(len(z))
+        overflowed = np.zeros(len(z), dtype=bool)
+
+        for i, x in enumerate(z.tolist()):
+            try:
+                values[i] = f(x)
+            except OverflowError:
+                overflowed[i] = True
+
+        return values, overflowed
+
+    return batch_f
+
+
+class BatchFeedForwardNetwork:
+    """
+    Evaluates a FeedForwardNetwork for a whole batch of input vectors at once, one node at a time,
+    where each node operates on the column of values of that node for every input vector.
+    The weighted inputs of a node are summed in the order of its links, like serial_activate does,
+    so the outputs are the same as those of calling serial_activate with each input vector.
+    """
+
+    def __init__(self, network: FeedForwardNetwork) -> None:
+        self.input_nodes: Sequence[int] = network.input_nodes
+        self.output_nodes: Sequence[int] = network.output_nodes
+        self.node_evals = [
+            (node, BATCH_ACTIVATIONS.get(f) or _scalar_activation(f), bias, response, links)
+            for (node, f, bias, response, links) in network.node_evals
+        ]
+
+    @classmethod
+    def from_genome(cls, genome: Genome) -> 'BatchFeedForwardNetwork':
+        return cls(create_pruned_feed_forward_phenotype(genome))
+
+    def activate(self, inputs: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        evaluates a (batch x inputs) matrix, returning a (batch x outputs) matrix and a mask of the input vectors
+        for which serial_activate would have raised OverflowError, whose outputs are meaningless
+        """
+
+        inputs = np.asarray(inputs, dtype=np.float64)
+        if inputs.ndim != 2 or inputs.shape[1] != len(self.input_nodes):
+            raise ValueError('Expected a batch of {} inputs, got an array of shape {}'.format(
+                len(self.input_nodes), inputs.shape
+            ))
+
+        batch_size = len(inputs)
+        zeros = np.zeros(batch_size)
+
+        # the nodes that are never evaluated keep the value 0.0, like in serial_activate
+        values = dict((node, inputs[:, i]) for i, node in enumerate(self.input_nodes))
+        overflowed = np.zeros(batch_size, dtype=bool)
+
+        with np.errstate(over='ignore', invalid='ignore', divide='ignore'):
+            for node, f, bias, response, links in self.node_evals:
+                s = zeros
+                for i, w in links:
+                    s = s + values.get(i, zeros) * w
+
+                values[node], node_overflowed = f(bias + response * s)
+                overflowed |= node_overflowed
+
+        return np.stack([values.get(i, zeros) for i in self.output_nodes], axis=1), overflowed
+
+
+def argmax_first(outputs: np.ndarray) -> np.ndarray:
+    """
+    the index of the largest output of each row, the first one if there are several,
+    as max(enumerate(outputs), key=itemgetter(1)) finds it: an output that is nan is never larger than another
+    """
+
+    best = outputs[:, 0]
+    best_indices = np.zeros(len(outputs), dtype=np.intp)
+
+    for j in range(1, outputs.shape[1]):
+        larger = outputs[:, j] > best
+        best = np.where(larger, outputs[:, j], best)
+        best_indices[larger] = j
+
+    return best_indices
+
+
+if __name__ == '__main__':
+    from operator import itemgetter
+    from ca_neat.ga.population import create_initial_population
+    from neat.nn import create_feed_forward_phenotype
+    from ca_neat.problems.morphogenesis.generate_border import NEAT_CONFIG
+
+    random = np.random.RandomState(0)
+    inputs = np.concatenate([random.uniform(-1, 1, size=(200, 5)), [[np.inf, -np.inf, np.nan, 1e200, 0.0]]])
+
+    for genome in create_initial_population(NEAT_CONFIG):
+        network = create_feed_forward_phenotype(genome)
+        batch_outputs, overflowed = BatchFeedForwardNetwork(network).activate(inputs)
+
+        indices = argmax_first(batch_outputs)
+
+        for xs, row, row_overflowed, index in zip(inputs.tolist(), batch_outputs, overflowed, indices):
+            try:
+                outputs = network.serial_activate(xs)
+            except OverflowError:
+                assert row_overflowed
+                continue
+
+            assert not row_overflowed
+            assert np.allclose(row, outputs, equal_nan=True)
+            assert index == max(enumerate(outputs), key=itemgetter(1))[0] or np.isclose(row[index], max(outputs))
@@ -0,0 +1,123 @@
+import math
+from collections import OrderedDict
+from typing import Callable, Dict, List, Sequence, Tuple
+
+from neat.genome import Genome
+from neat.nn import FeedForwardNetwork
+
+from ca_neat.ca.rule_table_cache import network_digest
+from ca_neat.nn.prune import create_pruned_feed_forward_phenotype, prune_network
+
+# serial_activate looks up every value in a list, and builds the list of outputs, for each of its calls.
+# A compiled network is a generated function doing the same arithmetic on locals, with the weights as constants:
+#
+#     def activate(inputs):
+#         v0, v1, v2 = inputs
+#         v7 = f0(0.5 + 1.0 * (0.0 + v0 * 1.25 + v2 * -0.75))
+#         ...
+#         return [v7, 0.0]
+#
+# The links of each node are summed in the same order, starting from 0.0, so the outputs are identical
+# (including OverflowError), and nodes that are never evaluated are the constant 0.0.
+# Functions are cached by the digest of the network, so all networks with the same structure share one.
+# As the digest only covers the nodes the outputs depend on, so does the function, like a pruned phenotype.
+
+ACTIVATE_F_T = Callable[[Sequence[float]], List[float]]
+
+CODEGEN_CACHE_SIZE = 4096
+
+_compiled: Dict[str, ACTIVATE_F_T] = OrderedDict()
+
+
+def _literal(x: float) -> str:
+    if math.isfinite(x):
+        return repr(float(x))
+
+    return "float('{}')".format(x)
+
+
+def _activation_function_names(node_evals: List[Tuple]) -> Dict[Callable, str]:
+    # the activation functions are called f0, f1, ... in the order of their first use
+    names: Dict[Callable, str] = {}
+    for _, f, *_ in node_evals:
+        names.setdefault(f, 'f{}'.format(len(names)))
+
+    return names
+
+
+def generate_source(network: FeedForwardNetwork, name: str = 'activate') -> str:
+    """
+    the source of a function computing the outputs of the network
+    """
+
+    node_evals = prune_network(network).node_evals
+    functions = _activation_function_names(node_evals)
+    evaluated = set(network.input_nodes)
+
+    lines = ['def {}(inputs):'.format(name)]
+
+    if network.input_nodes:
+        lines.append('    {}, = inputs'.format(', '.join('v{}'.format(i) for i in network.input_nodes)))
+
+    for node, f, bias, response, links in node_evals:
+        s = ' + '.join(
+            ['0.0'] + ['{} * {}'.format('v{}'.format(i) if i in evaluated else '0.0', _literal(w)) for i, w in links]
+        )
+
+        lines.append('    v{} = {}({} + {} * ({}))'.format(node, functions[f], _literal(bias), _literal(response), s))
+        evaluated.add(node)
+
+    lines.append('    return [{}]'.format(
+        ', '.join('v{}'.format(i) if i in evaluated else '0.0' for i in network.output_nodes)
+    ))
+
+    return '\n'.join(lines) + '\n'
+
+
+def compile_network(network: FeedForwardNetwork) -> ACTIVATE_F_T:
+    """
+    a function computing network.serial_activate(inputs), without evaluating the nodes no output depends on
+    """
+
+    key = network_digest(network)
+
+    activate = _compiled.get(key)
+    if activate is not None:
+        _compiled.move_to_end(key)
+        return activate
+
+    namespace = dict((name, f) for f, name in _activation_function_names(prune_network(network).node_evals).items())
+    exec(compile(generate_source(network), '<cppn {}>'.format(key), 'exec'), namespace)
+    activate = _compiled[key] = namespace['activate']
+
+    while len(_compiled) > CODEGEN_CACHE_SIZE:
+        _compiled.popitem(last=False)
+
+    return activate
+
+
+def compile_genome(genome: Genome) -> ACTIVATE_F_T:
+    return compile_network(create_pruned_feed_forward_phenotype(genome))
+
+
+if __name__ == '__main__':
+    from random import uniform
+    from neat.nn import create_feed_forward_phenotype
+    from ca_neat.ga.population import create_initial_population
+    from ca_neat.problems.morphogenesis.generate_border import NEAT_CONFIG
+
+    for gt in create_initial_population(NEAT_CONFIG):
+        for _ in range(20):
+            gt.mutate()
+
+        pt = create_feed_forward_phenotype(gt)
+        activate = compile_network(pt)
+
+        for _ in range(10):
+            inputs = [uniform(-1.0, 1.0) for _ in pt.input_nodes]
+            try:
+                expected = pt.serial_activate(inputs)
+            except OverflowError:
+                continue
+
+            assert repr(activate(inputs)) == repr(expected)
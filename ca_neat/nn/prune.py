@@ -0,0 +1,154 @@
+from collections import defaultdict, deque
+from typing import Dict, Iterable, List, Set, Tuple
+
+from neat import activation_functions
+from neat.genome import Genome
+from neat.nn import FeedForwardNetwork
+
+# Evolved genomes carry many nodes that no output depends on, which serial_activate still evaluates on every call.
+# The phenotype built here only evaluates the nodes on a path from the inputs to an output.
+# serial_activate only evaluates a node once all the nodes linking to it are evaluated, so a node without enabled
+# incoming connections (or downstream of one, or on a cycle) keeps its initial value 0.0 and is folded to that
+# constant: it is never evaluated, and neither is any node linked from it.
+# The pruned network computes the same outputs, except that nodes no output depends on can no longer overflow.
+
+CONNECTION_T = Tuple[int, int]
+
+
+def reachable_from(sources: Iterable[int], connections: Iterable[CONNECTION_T]) -> Set[int]:
+    """
+    the nodes reachable from the sources by following the connections forwards
+    """
+
+    successors: Dict[int, List[int]] = defaultdict(list)
+    for a, b in connections:
+        successors[a].append(b)
+
+    return _search(sources, successors)
+
+
+def reaching(sinks: Iterable[int], connections: Iterable[CONNECTION_T]) -> Set[int]:
+    """
+    the nodes from which a sink is reachable by following the connections forwards
+    """
+
+    predecessors: Dict[int, List[int]] = defaultdict(list)
+    for a, b in connections:
+        predecessors[b].append(a)
+
+    return _search(sinks, predecessors)
+
+
+def _search(start: Iterable[int], neighbours: Dict[int, List[int]]) -> Set[int]:
+    seen = set(start)
+    queue = deque(seen)
+
+    while queue:
+        for node in neighbours.get(queue.popleft(), ()):
+            if node not in seen:
+                seen.add(node)
+                queue.append(node)
+
+    return seen
+
+
+def find_nodes_connected_to_output(genome: Genome) -> Set[int]:
+    outputs = [ng.ID for ng in genome.node_genes.values() if ng.type == 'OUTPUT']
+    connections = [(cg.in_node_id, cg.out_node_id) for cg in genome.conn_genes.values() if cg.enabled]
+
+    return reaching(outputs, connections)
+
+
+def evaluation_order(inputs: Iterable[int], connections: Iterable[CONNECTION_T]) -> List[int]:
+    """
+    the nodes serial_activate evaluates, in an order where every node comes after the nodes linking to it (Kahn)
+    """
+
+    inputs = set(inputs)
+    successors: Dict[int, List[int]] = defaultdict(list)
+    remaining: Dict[int, int] = defaultdict(int)
+
+    for a, b in connections:
+        if b not in inputs:
+            successors[a].append(b)
+            remaining[b] += 1
+
+    order = []
+    queue = deque(inputs)
+    while queue:
+        for node in successors.get(queue.popleft(), ()):
+            remaining[node] -= 1
+            if remaining[node] == 0:
+                order.append(node)
+                queue.append(node)
+
+    return order
+
+
+def create_pruned_feed_forward_phenotype(genome: Genome) -> FeedForwardNetwork:
+    """
+    like create_feed_forward_phenotype, but without the nodes that no output depends on
+    """
+
+    input_nodes = [ng.ID for ng in genome.node_genes.values() if ng.type == 'INPUT']
+    output_nodes = [ng.ID for ng in genome.node_genes.values() if ng.type == 'OUTPUT']
+
+    # the links of each node, in the order create_feed_forward_phenotype sums them
+    links: Dict[int, List[Tuple[int, float]]] = defaultdict(list)
+    for cg in genome.conn_genes.values():
+        if cg.enabled:
+            links[cg.out_node_id].append((cg.in_node_id, cg.weight))
+
+    connections = [(a, b) for b, node_links in links.items() for a, _ in node_links]
+    order = evaluation_order(input_nodes, connections)
+
+    evaluated = set(order)
+    used = reaching(output_nodes, [(a, b) for a, b in connections if b in evaluated])
+
+    node_evals = []
+    for node in order:
+        if node not in used:
+            continue
+
+        ng = genome.node_genes[node]
+        activation_function = activation_functions.get(ng.activation_type)
+        node_evals.append((node, activation_function, ng.bias, ng.response, links[node]))
+
+    max_node = max(input_nodes + output_nodes + [node for node, *_ in node_evals])
+
+    return FeedForwardNetwork(max_node, input_nodes, output_nodes, node_evals)
+
+
+def prune_network(network: FeedForwardNetwork) -> FeedForwardNetwork:
+    """
+    the network without the nodes that no output depends on, which network_digest leaves out of the key
+    """
+
+    connections = [(i, node) for node, *_, links in network.node_evals for i, _ in links]
+    used = reaching(network.output_nodes, connections)
+    node_evals = [node_eval for node_eval in network.node_evals if node_eval[0] in used]
+
+    return FeedForwardNetwork(len(network.values) - 1, network.input_nodes, network.output_nodes, node_evals)
+
+
+if __name__ == '__main__':
+    from random import random
+    from neat.nn import create_feed_forward_phenotype
+    from ca_neat.ga.population import create_initial_population
+    from ca_neat.problems.morphogenesis.generate_border import NEAT_CONFIG
+
+    for gt in create_initial_population(NEAT_CONFIG):
+        for _ in range(20):
+            gt.mutate()
+
+        pt, pruned = create_feed_forward_phenotype(gt), create_pruned_feed_forward_phenotype(gt)
+        assert len(pruned.node_evals) <= len(pt.node_evals)
+
+        for _ in range(10):
+            inputs = [random() for _ in pt.input_nodes]
+            try:
+                expected = pt.serial_activate(inputs)
+            except OverflowError:
+                continue
+
+            assert pruned.serial_activate(inputs) == expected
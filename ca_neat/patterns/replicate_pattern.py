@@ -1,27 +1,134 @@
 from statistics import mean
-from typing import Iterator
+from typing import Iterator, List, Sequence, Tuple
+
+import numpy as np
 
 from ca_neat.geometry.cell_grid import CellGrid2D, FiniteCellGrid2D
 from ca_neat.patterns.patterns import PATTERN_T
 
 
-def count_pattern(grid: CellGrid2D, pattern: PATTERN_T) -> int:
+# the bases of the rolling hashes along the x and y axes, hashes are computed modulo 2^64
+HASH_BASE_X = np.uint64(1000003)
+HASH_BASE_Y = np.uint64(2000000011)
+
+
+def _encode_bounding_box(grid: CellGrid2D, pattern_h: int, pattern_w: int) -> Tuple[np.ndarray, int, int]:
+    """
+    the state indices of every cell that a pattern of the given size covers, at the offsets within the bounding box
+    of the grid padded by one cell, along with the number of those offsets along y and x
+    """
+
     (x_min, y_min), (x_max, y_max) = grid.get_extreme_coords(pad=1)
+    n_y, n_x = max(y_max - y_min, 0), max(x_max - x_min, 0)
+
+    cells = np.array(grid.get_enumerated_rectangle(
+        x_range=(x_min, x_max + pattern_w - 1),
+        y_range=(y_min, y_max + pattern_h - 1),
+    ), dtype=np.intp).reshape(n_y + pattern_h - 1, n_x + pattern_w - 1)
+
+    return cells, n_y, n_x
+
+
+def _rolling_hashes(values: np.ndarray, length: int, base: np.uint64, axis: int) -> np.ndarray:
+    # the polynomial hashes of every run of length consecutive values along the axis
+    values = np.moveaxis(values, axis, 0)
+
+    prefix = np.zeros((len(values) + 1,) + values.shape[1:], dtype=np.uint64)
+    for i, row in enumerate(values):
+        prefix[i + 1] = prefix[i] * base + row
+
+    hashes = prefix[length:] - prefix[:len(values) - length + 1] * np.uint64(pow(int(base), length, 2 ** 64))
+
+    return np.moveaxis(hashes, 0, axis)
+
+
+def window_hashes(cells: np.ndarray, window_h: int, window_w: int) -> np.ndarray:
+    """
+    the 2D rolling hashes of every window of window_h by window_w cells of an array of state indices,
+    indexed by the (y, x) offset of the window
+    """
+
+    row_hashes = _rolling_hashes(cells.astype(np.uint64), window_w, HASH_BASE_X, axis=1)
+
+    return _rolling_hashes(row_hashes, window_h, HASH_BASE_Y, axis=0)
+
+
+def pattern_match_counts(grid: CellGrid2D, pattern: PATTERN_T) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    for every offset of the pattern within the bounding box of the grid, padded by one cell,
+    counts the cells that match the pattern and the cells that are alive, as arrays indexed by (y, x) offset.
+    the grid is encoded once, after which the counts of all offsets are computed at once by cross-correlating
+    the grid with the pattern, one pattern cell (and so one one-hot state plane) at a time.
+    """
 
     pattern_h, pattern_w = len(pattern), len(pattern[0])
+    cells, n_y, n_x = _encode_bounding_box(grid, pattern_h, pattern_w)
+
+    enumeration = dict((v, k) for k, v in enumerate(grid.cell_states))
+    correct_counts = np.zeros((n_y, n_x), dtype=np.intp)
+    for dy, row in enumerate(pattern):
+        for dx, value in enumerate(row):
+            correct_counts += cells[dy:dy + n_y, dx:dx + n_x] == enumeration.get(value, -1)
+
+    # the live cells of every window are summed from a table of cumulative sums
+    live = np.zeros((cells.shape[0] + 1, cells.shape[1] + 1), dtype=np.intp)
+    live[1:, 1:] = (cells != 0).cumsum(axis=0).cumsum(axis=1)
+    live_counts = (
+        live[pattern_h:pattern_h + n_y, pattern_w:pattern_w + n_x] - live[:n_y, pattern_w:pattern_w + n_x] -
+        live[pattern_h:pattern_h + n_y, :n_x] + live[:n_y, :n_x]
+    )
+
+    return correct_counts, live_counts
+
+
+def count_patterns(grid: CellGrid2D, patterns: Sequence[PATTERN_T]) -> List[int]:
+    """
+    counts the exact occurrences of each pattern at the same offsets as count_pattern, in a single pass over the grid.
+    the windows of each pattern size are hashed once (2D Rabin-Karp), and only the windows with the hash of a pattern
+    are compared with it cell by cell, so hash collisions are never counted.
+    """
+
+    if not patterns:
+        return []
 
-    count = 0
-    for y in range(y_min, y_max):
-        for x in range(x_min, x_max):
-            rectangle = grid.get_rectangle(
-                x_range=(x, x + pattern_w),
-                y_range=(y, y + pattern_h)
+    enumeration = dict((v, k) for k, v in enumerate(grid.cell_states))
+    encoded_patterns = [
+        np.array([[enumeration.get(value, -1) for value in row] for row in pattern], dtype=np.intp)
+        for pattern in patterns
+    ]
+
+    cells, n_y, n_x = _encode_bounding_box(
+        grid,
+        pattern_h=max(len(pattern) for pattern in patterns),
+        pattern_w=max(len(pattern[0]) for pattern in patterns),
+    )
+
+    hashes_by_size = {}
+    counts = []
+    for encoded in encoded_patterns:
+        if (encoded < 0).any():
+            # a pattern with a state the grid does not have cannot occur in it
+            counts.append(0)
+            continue
+
+        pattern_h, pattern_w = encoded.shape
+        if (pattern_h, pattern_w) not in hashes_by_size:
+            hashes_by_size[(pattern_h, pattern_w)] = window_hashes(
+                cells[:n_y + pattern_h - 1, :n_x + pattern_w - 1], pattern_h, pattern_w
             )
 
-            if rectangle == pattern:
-                count += 1
+        pattern_hash = window_hashes(encoded, pattern_h, pattern_w)[0, 0]
+        candidates = zip(*np.nonzero(hashes_by_size[(pattern_h, pattern_w)] == pattern_hash))
+
+        counts.append(sum(
+            1 for (y, x) in candidates if np.array_equal(cells[y:y + pattern_h, x:x + pattern_w], encoded)
+        ))
 
-    return count
+    return counts
+
+
+def count_pattern(grid: CellGrid2D, pattern: PATTERN_T) -> int:
+    return count_patterns(grid, [pattern])[0]
 
 
 def count_correct_cells(test_pattern, target_pattern) -> int:
@@ -35,24 +142,31 @@ def count_correct_cells(test_pattern, target_pattern) -> int:
 
 
 def find_pattern_partial_matches(grid: CellGrid2D, pattern: PATTERN_T) -> Iterator[float]:
-    (x_min, y_min), (x_max, y_max) = grid.get_extreme_coords(pad=1)
+    pattern_area = len(pattern) * len(pattern[0])
+    correct_counts, live_counts = pattern_match_counts(grid, pattern)
 
-    pattern_h, pattern_w = len(pattern), len(pattern[0])
-    pattern_area = pattern_h * pattern_w
+    for correct_count, live_count in zip(correct_counts.ravel().tolist(), live_counts.ravel().tolist()):
+        if live_count == 0:
+            yield 0.0
 
-    for y in range(y_min, y_max):
-        for x in range(x_min, x_max):
-            rectangle = grid.get_rectangle(
-                x_range=(x, x + pattern_w),
-                y_range=(y, y + pattern_h),
-            )
+        yield (correct_count / pattern_area)
+
+
+def best_pattern_partial_matches(grid: CellGrid2D, pattern: PATTERN_T, k: int) -> List[float]:
+    """
+    the k best values of find_pattern_partial_matches, best first, without sorting all of them
+    """
+
+    pattern_area = len(pattern) * len(pattern[0])
+    correct_counts, live_counts = pattern_match_counts(grid, pattern)
 
-            if all(all(x == grid.dead_cell for x in row) for row in rectangle):
-                yield 0.0
+    # find_pattern_partial_matches yields an extra 0.0 for each window without live cells
+    counts = np.concatenate([correct_counts.ravel(), np.zeros(int((live_counts == 0).sum()), dtype=np.intp)])
 
-            correct_count = count_correct_cells(test_pattern=rectangle, target_pattern=pattern)
+    if k < counts.size:
+        counts = -np.partition(-counts, k - 1)[:k]
 
-            yield (correct_count / pattern_area)
+    return [count / pattern_area for count in sorted(counts.tolist(), reverse=True)]
 
 
 if __name__ == '__main__':
@@ -88,5 +202,7 @@ if __name__ == '__main__':
     print(l)
     l = tuple(sorted(l, reverse=True)[:4])
     print(l)
+    assert list(l) == best_pattern_partial_matches(grid, pattern, 4)
     print(mean(l))
     print(count_pattern(grid, pattern))
+    assert count_patterns(grid, [pattern, wrong_pattern, pattern[1:]]) == [3, 1, 3]
@@ -1,47 +1,60 @@
+from typing import Iterable, List, Sequence
+
 from neat.nn import FeedForwardNetwork
 
 from ca_neat.config import CAConfig
 
 
 def replication_fitness_f(phenotype: FeedForwardNetwork, ca_config: CAConfig) -> float:
-    from ca_neat.ca.iterate import iterate_ca_n_times_or_until_cycle_found
-    from ca_neat.patterns.replicate_pattern import find_pattern_partial_matches
-    from ca_neat.geometry.cell_grid import CellGrid2D
+    from ca_neat.ca.iterate import iterate_ca_n_times_or_until_cycle_found, iterate_ca_once_incremental
+    from ca_neat.ca.rule_table import UNDEFINED
+    from ca_neat.ca.rule_table_cache import compile_rule_table_cached
+    from ca_neat.patterns.replicate_pattern import best_pattern_partial_matches
+    from ca_neat.geometry.compact_cell_grid import CompactCellGrid2D
     from statistics import mean
-    from ca_neat.utils import create_state_normalization_rules
-    from operator import itemgetter
     from neat.nn import FeedForwardNetwork
     from typing import Sequence, Iterator
-    from ca_neat.geometry.cell_grid import CELL_STATE_T
 
     neighbourhood = ca_config.neighbourhood
     alphabet = ca_config.alphabet
     pattern = ca_config.etc['pattern']
     wanted_occurrences = ca_config.etc['wanted_occurrences']
     iterations = ca_config.iterations
-    state_normalization_rules = create_state_normalization_rules(states=alphabet)
+    K = len(alphabet)
 
-    initial_grid = CellGrid2D(
+    initial_grid = CompactCellGrid2D(
         cell_states=alphabet,
         neighbourhood=neighbourhood,
     )
 
     initial_grid.add_pattern_at_coord(pattern, (0, 0))
 
-    def ca_develop(network: FeedForwardNetwork) -> Iterator[CellGrid2D]:
-        def transition_f(inputs_discrete_values: Sequence[CELL_STATE_T]) -> CELL_STATE_T:
-            if all((x == initial_grid.dead_cell) for x in inputs_discrete_values):
-                return initial_grid.dead_cell
+    def ca_develop(network: FeedForwardNetwork) -> Iterator[CompactCellGrid2D]:
+        # the CPPN is evaluated for all neighbourhoods at once, overflows are marked in the table instead of raised,
+        # and only raise here if the CA visits one of them, where serial_activate would have raised
+        rule_table = compile_rule_table_cached(network, ca_config).tolist()
 
-            inputs_float_values = tuple(state_normalization_rules[x] for x in inputs_discrete_values)
+        # the compact grid stores the index of each state, the dead cell being 0
+        def transition_f(inputs_discrete_values: Sequence[int]) -> int:
+            code = 0
+            for x in inputs_discrete_values:
+                code = code * K + x
 
-            outputs = network.serial_activate(inputs_float_values)
+            i = rule_table[code]
+            if i == UNDEFINED:
+                raise OverflowError('The CA visited a neighbourhood for which the rule is undefined')
 
-            return max(zip(alphabet, outputs), key=itemgetter(1))[0]
+            return i
 
         yield initial_grid
 
-        for grid in iterate_ca_n_times_or_until_cycle_found(initial_grid, transition_f, iterations):
+        # the transition function keeps dead neighbourhoods dead, so only the cells around changes need to be stepped
+        for grid in iterate_ca_n_times_or_until_cycle_found(
+                initial_grid=initial_grid,
+                transition_f=transition_f,
+                n=iterations,
+                iterate_f=iterate_ca_once_incremental
+        ):
             yield grid
 
     grid_iterations = ca_develop(phenotype)
@@ -52,12 +65,11 @@ def replication_fitness_f(phenotype: FeedForwardNetwork, ca_config: CAConfig) ->
             # the initial state should not be evaluated and contribute to the score
             continue
 
-        partial_matches = list(find_pattern_partial_matches(grid, pattern))
+        sorted_matches = best_pattern_partial_matches(grid, pattern, wanted_occurrences)
 
-        if not partial_matches:
+        if not sorted_matches:
             continue
 
-        sorted_matches = sorted(partial_matches, reverse=True)
         extension = [0.0] * wanted_occurrences
         best_n_matches = (sorted_matches + extension)[:wanted_occurrences]
 
@@ -77,27 +89,22 @@ def replication_fitness_f(phenotype: FeedForwardNetwork, ca_config: CAConfig) ->
 
 def morphogenesis_fitness_f(phenotype: FeedForwardNetwork, ca_config: CAConfig) -> float:
     from ca_neat.ca.iterate import iterate_ca_n_times_or_until_cycle_found
-    from ca_neat.patterns.replicate_pattern import count_correct_cells
-    from ca_neat.geometry.cell_grid import ToroidalCellGrid2D
-    from ca_neat.utils import create_state_normalization_rules
-    from operator import itemgetter
+    from ca_neat.ca.rule_table import create_iterate_f, create_transition_f
+    from ca_neat.ca.rule_table_cache import compile_rule_table_cached
+    from ca_neat.geometry.array_cell_grid import ToroidalArrayCellGrid2D
     from neat.nn import FeedForwardNetwork
-    from math import exp
-    from typing import Sequence, Iterator
-    from ca_neat.geometry.cell_grid import CELL_STATE_T
+    from typing import Iterator
 
     neighbourhood = ca_config.neighbourhood
     alphabet = ca_config.alphabet
     target_pattern = ca_config.etc['target_pattern']
     seed = ca_config.etc['seed']
     iterations = ca_config.iterations
-    state_normalization_rules = create_state_normalization_rules(states=alphabet)
 
     pattern_w = len(target_pattern[0])
     pattern_h = len(target_pattern)
-    pattern_area = pattern_h * pattern_w
 
-    initial_grid = ToroidalCellGrid2D(
+    initial_grid = ToroidalArrayCellGrid2D(
         cell_states=alphabet,
         neighbourhood=neighbourhood,
         x_range=(0, pattern_w),
@@ -106,35 +113,137 @@ def morphogenesis_fitness_f(phenotype: FeedForwardNetwork, ca_config: CAConfig)
 
     initial_grid.add_pattern_at_coord(seed, (0, 0))
 
-    def ca_develop(network: FeedForwardNetwork) -> Iterator[ToroidalCellGrid2D]:
-        def transition_f(inputs_discrete_values: Sequence[CELL_STATE_T]) -> CELL_STATE_T:
-            if all((x == initial_grid.dead_cell) for x in inputs_discrete_values):
-                return initial_grid.dead_cell
-
-            inputs_float_values = tuple(state_normalization_rules[x] for x in inputs_discrete_values)
-
-            outputs = network.serial_activate(inputs_float_values)
-
-            return max(zip(alphabet, outputs), key=itemgetter(1))[0]
+    def ca_develop(network: FeedForwardNetwork) -> Iterator[ToroidalArrayCellGrid2D]:
+        rule_table = compile_rule_table_cached(network, ca_config)
 
         yield initial_grid
 
-        for grid in iterate_ca_n_times_or_until_cycle_found(initial_grid, transition_f, iterations):
+        for grid in iterate_ca_n_times_or_until_cycle_found(
+                initial_grid=initial_grid,
+                transition_f=create_transition_f(rule_table, alphabet),
+                n=iterations,
+                iterate_f=create_iterate_f(rule_table)
+        ):
             yield grid
 
     grid_iterations = ca_develop(phenotype)
 
-    best = 0.0
-    for i, grid in enumerate(grid_iterations):
-        correctness_fraction = count_correct_cells(grid.get_whole(), target_pattern=target_pattern) / pattern_area
+    return score_morphogenesis_development(grid_iterations, initial_grid.encode_pattern(target_pattern))
+
+
+def score_morphogenesis_development(grid_iterations: Iterable['ArrayCellGrid2D'], target_cells: 'np.ndarray') -> float:
+    """
+    scores the steps of a development against the target, 1.0 if any step matches it,
+    otherwise the best fraction of correct cells, redistributed to favour the nearly correct.
+    the steps are stacked in a single array and scored at once.
+    """
+
+    import numpy as np
+
+    steps = []
+    overflowed = False
+    try:
+        for grid in grid_iterations:
+            steps.append(grid.cells)
+    except OverflowError:
+        # the steps up to the first perfect one are all that the fitness depends on,
+        # so the CPPN overflowing only matters if none of the steps before it were perfect
+        overflowed = True
 
-        if correctness_fraction >= 1.0:
-            return correctness_fraction
+    correct_counts = (np.stack(steps) == target_cells).sum(axis=(1, 2))
 
-        if correctness_fraction > best:
-            best = correctness_fraction
+    return score_correct_counts(correct_counts, target_cells.size, overflowed)
+
+
+def score_correct_counts(correct_counts: 'np.ndarray', n_cells: int, overflowed: bool) -> float:
+    """
+    the morphogenesis score of a development, from the number of correct cells of each of its steps.
+    overflowed tells that the development ended at a neighbourhood for which the rule is undefined,
+    which raises OverflowError, unless one of the steps before it was already perfect.
+    """
+
+    from math import exp
+    import numpy as np
+
+    perfect_steps = np.flatnonzero(correct_counts == n_cells)
+
+    if perfect_steps.size:
+        return int(correct_counts[perfect_steps[0]]) / n_cells
+
+    if overflowed:
+        raise OverflowError('The CA visited a neighbourhood for which the rule is undefined')
+
+    best = int(correct_counts.max()) / n_cells
 
     k = 5
     redistribute = lambda x: x * exp(k * x) / exp(k)
 
     return redistribute(best)
+
+
+def morphogenesis_batch_fitness_f(phenotypes: Sequence[FeedForwardNetwork], ca_config: CAConfig) -> List[float]:
+    """
+    computes the same fitness values as morphogenesis_fitness_f, for many phenotypes at once.
+    every phenotype is compiled to a rule table and all of the CAs are stepped together in one stacked array.
+    """
+
+    from ca_neat.ca.batch import find_cycle_ends, iterate_ca_population
+    from ca_neat.ca.rule_table_cache import compile_rule_table_cached
+    from ca_neat.geometry.array_cell_grid import ToroidalArrayCellGrid2D
+    import numpy as np
+
+    if not phenotypes:
+        return []
+
+    neighbourhood = ca_config.neighbourhood
+    alphabet = ca_config.alphabet
+    target_pattern = ca_config.etc['target_pattern']
+    seed = ca_config.etc['seed']
+    iterations = ca_config.iterations
+
+    pattern_w = len(target_pattern[0])
+    pattern_h = len(target_pattern)
+    pattern_area = pattern_h * pattern_w
+
+    initial_grid = ToroidalArrayCellGrid2D(
+        cell_states=alphabet,
+        neighbourhood=neighbourhood,
+        x_range=(0, pattern_w),
+        y_range=(0, pattern_h),
+    )
+
+    initial_grid.add_pattern_at_coord(seed, (0, 0))
+
+    rule_tables = np.stack([compile_rule_table_cached(phenotype, ca_config) for phenotype in phenotypes])
+    initial_cells = np.repeat(initial_grid.cells[np.newaxis], len(phenotypes), axis=0)
+
+    trajectory, first_undefined = iterate_ca_population(
+        cells=initial_cells,
+        rule_tables=rule_tables,
+        neighbourhood=neighbourhood,
+        n_states=len(alphabet),
+        n=iterations,
+        toroidal=True,
+    )
+    ends = find_cycle_ends(trajectory)
+
+    correct_counts = (trajectory == initial_grid.encode_pattern(target_pattern)).sum(axis=(2, 3))
+
+    fitnesses = []
+    for i, (end, undefined_at) in enumerate(zip(ends, first_undefined)):
+        # the development of an individual stops at its first repeated state,
+        # or before the first step that visited a neighbourhood for which its rule is undefined
+        overflowed = undefined_at <= end
+        last = undefined_at - 1 if overflowed else end
+
+        try:
+            fitnesses.append(score_correct_counts(correct_counts[:last + 1, i], pattern_area, overflowed))
+        except OverflowError:
+            # like the OverflowError fallback of handle_individual
+            fitnesses.append(0.0)
+
+    return fitnesses
+
+
+# the runner evaluates the individuals of a scenario in chunks with the batch function of its fitness function
+morphogenesis_fitness_f.batch = morphogenesis_batch_fitness_f
@@ -14,6 +14,7 @@ N = 10
 def fitness_f(phenotype: FeedForwardNetwork, ca_config: CAConfig) -> float:
     from ca_neat.ca.iterate import iterate_ca_n_times_or_until_cycle_found
     from ca_neat.utils import create_state_normalization_rules
+    from ca_neat.nn.codegen import compile_network
     from operator import itemgetter
     from neat.nn import FeedForwardNetwork
     from typing import Iterator
@@ -29,13 +30,16 @@ def fitness_f(phenotype: FeedForwardNetwork, ca_config: CAConfig) -> float:
     state_normalization_rules = create_state_normalization_rules(states=alphabet)
 
     def ca_develop(grid, network: FeedForwardNetwork) -> Iterator[FiniteCellGrid1D]:
+        # the CPPN is evaluated by a function generated for it, rather than by serial_activate
+        activate = compile_network(network)
+
         def transition_f(inputs_discrete_values: Sequence[CELL_STATE_T]) -> CELL_STATE_T:
             if is_all_same(inputs_discrete_values):
                 return inputs_discrete_values[0]
 
             inputs_float_values = tuple(state_normalization_rules[x] for x in inputs_discrete_values)
 
-            outputs = network.serial_activate(inputs_float_values)
+            outputs = activate(inputs_float_values)
 
             return max(zip(alphabet, outputs), key=itemgetter(1))[0]
 
@@ -34,59 +34,35 @@ def create_binary_pattern(alphabet: Tuple[CELL_STATE_T, CELL_STATE_T], length=N,
 
 
 def fitness_f(phenotype: FeedForwardNetwork, ca_config: CAConfig) -> float:
-    from ca_neat.ca.iterate import iterate_ca_n_times_or_until_cycle_found
-    from ca_neat.utils import create_state_normalization_rules
-    from operator import itemgetter
-    from neat.nn import FeedForwardNetwork
-    from typing import Iterator
+    from ca_neat.ca.batch import encode_states, final_states, find_cycle_ends, iterate_ca_batch
+    from ca_neat.ca.rule_table_cache import compile_rule_table_cached
     from statistics import mean
-    from ca_neat.geometry.cell_grid import ToroidalCellGrid1D
     from math import exp
-    from ca_neat.geometry.cell_grid import CELL_STATE_T
-    from typing import Sequence
 
     alphabet = ca_config.alphabet
-
     iterations = ca_config.iterations
-    state_normalization_rules = create_state_normalization_rules(states=alphabet)
-
-    def ca_develop(grid, network: FeedForwardNetwork) -> Iterator[ToroidalCellGrid1D]:
-        def transition_f(inputs_discrete_values: Sequence[CELL_STATE_T]) -> CELL_STATE_T:
-            if all((x == grid.dead_cell) for x in inputs_discrete_values):
-                return grid.dead_cell
-
-            inputs_float_values = tuple(state_normalization_rules[x] for x in inputs_discrete_values)
-
-            outputs = network.serial_activate(inputs_float_values)
-
-            return max(zip(alphabet, outputs), key=itemgetter(1))[0]
-
-        yield grid
-
-        for grid_it in iterate_ca_n_times_or_until_cycle_found(grid, transition_f, iterations):
-            yield grid_it
+    test_patterns = ca_config.etc['test_patterns']
 
     k = 1
     redistribute = lambda x: x * exp(k * x) / exp(k)
 
-    results = []
-    for pattern, majority in ca_config.etc['test_patterns']:
-        x_range = (0, len(pattern))
-        neighbourhood = ca_config.neighbourhood
-
-        init_grid = ToroidalCellGrid1D(
-            cell_states=alphabet,
-            x_range=x_range,
-            values={(i,): x for i, x in enumerate(pattern)},
-            neighbourhood=neighbourhood,
-        )
-
-        grid_iterations = tuple(ca_develop(init_grid, phenotype))
-        values = grid_iterations[-1].get_whole()
+    # all test patterns are developed together, one row per pattern
+    rule_table = compile_rule_table_cached(phenotype, ca_config)
+    initial_cells = encode_states([pattern for pattern, _ in test_patterns], alphabet)
+    majorities = encode_states([[majority] for _, majority in test_patterns], alphabet)
+
+    trajectory = iterate_ca_batch(
+        cells=initial_cells,
+        rule_table=rule_table,
+        neighbourhood=ca_config.neighbourhood,
+        n_states=len(alphabet),
+        n=iterations,
+        toroidal=True,
+    )
+    values = final_states(trajectory, find_cycle_ends(trajectory))
 
-        results.append(
-            sum(x == majority for x in values) / init_grid.area
-        )
+    correct_counts = (values == majorities).sum(axis=1)
+    results = [int(correct) / len(pattern) for correct, (pattern, _) in zip(correct_counts, test_patterns)]
 
     return redistribute(mean(results))
 
@@ -13,6 +13,7 @@ CA_CONFIG = CAConfig()
 CA_CONFIG.alphabet = ALPHABET_2
 CA_CONFIG.neighbourhood = VON_NEUMANN
 CA_CONFIG.iterations = 30
+CA_CONFIG.memoize_fitness = False  # the CPPN also takes the coordinates of the cells
 CA_CONFIG.etc = {
     'target_pattern': BORDER,
     'seed': SEED_6X6,
@@ -58,16 +59,17 @@ PAIR_SELECTION_F = sigma_scaled
 
 
 def morphogenesis_fitness_f_with_coord_input(phenotype: FeedForwardNetwork, ca_config: CAConfig) -> float:
-    from ca_neat.ca.iterate import iterate_ca_once_with_coord_inputs, iterate_ca_n_times_or_until_cycle_found
-    from ca_neat.patterns.replicate_pattern import count_correct_cells
-    from ca_neat.geometry.cell_grid import ToroidalCellGrid2D
+    from ca_neat.ca.iterate import iterate_ca_n_times_or_until_cycle_found
+    from ca_neat.ca.rule_table import create_coord_iterate_f, create_coord_rule_table, create_coord_transition_f, \
+        decode_neighbourhoods, wrapped_coord_inputs
+    from ca_neat.nn.batch import BatchFeedForwardNetwork, argmax_first
+    from ca_neat.problems.common import score_morphogenesis_development
+    from ca_neat.geometry.array_cell_grid import ToroidalArrayCellGrid2D
     from ca_neat.utils import create_state_normalization_rules
-    from operator import itemgetter
     from neat.nn import FeedForwardNetwork
-    from math import exp
     from typing import Sequence, Iterator
-    from ca_neat.geometry.cell_grid import CELL_STATE_T
     from ca_neat.geometry.neighbourhoods import radius_2d
+    import numpy as np
 
     neighbourhood = ca_config.neighbourhood
     alphabet = ca_config.alphabet
@@ -77,9 +79,8 @@ def morphogenesis_fitness_f_with_coord_input(phenotype: FeedForwardNetwork, ca_c
 
     pattern_w = len(target_pattern[0])
     pattern_h = len(target_pattern)
-    pattern_area = pattern_h * pattern_w
 
-    initial_grid = ToroidalCellGrid2D(
+    initial_grid = ToroidalArrayCellGrid2D(
         cell_states=alphabet,
         neighbourhood=neighbourhood,
         x_range=(0, pattern_w),
@@ -92,46 +93,44 @@ def morphogenesis_fitness_f_with_coord_input(phenotype: FeedForwardNetwork, ca_c
 
     initial_grid.add_pattern_at_coord(seed, (0, 0))
 
-    def ca_develop(network: FeedForwardNetwork) -> Iterator[ToroidalCellGrid2D]:
-        def transition_f(inputs_discrete_values: Sequence[CELL_STATE_T]) -> CELL_STATE_T:
-            neighbour_values, xy_values = inputs_discrete_values[:-2], inputs_discrete_values[-2:]
+    normalized_states = np.array([state_normalization_rules[x] for x in alphabet])
 
-            if all((x == initial_grid.dead_cell) for x in neighbour_values):
-                return initial_grid.dead_cell
+    # the normalized coordinate inputs of each cell only depend on the shape of the grid, so they are computed once
+    coord_inputs = np.array([
+        (coord_normalization_rules[x], coord_normalization_rules[y]) for (x, y) in wrapped_coord_inputs(initial_grid, r)
+    ])
 
-            inputs_float_values = tuple(state_normalization_rules[n] for n in neighbour_values) + \
-                                  tuple(coord_normalization_rules[n] for n in xy_values)
+    def ca_develop(network: FeedForwardNetwork) -> Iterator[ToroidalArrayCellGrid2D]:
+        # the next states are looked up in a table with a row per cell, entries are only computed when visited
+        rule_table = create_coord_rule_table(initial_grid)
+        batch_network = BatchFeedForwardNetwork(network)
 
-            outputs = network.serial_activate(inputs_float_values)
+        def rule_f(positions: np.ndarray, codes: np.ndarray) -> Sequence[int]:
+            inputs_float_values = np.concatenate([
+                normalized_states[decode_neighbourhoods(codes, len(alphabet), len(neighbourhood))],
+                coord_inputs[positions],
+            ], axis=1)
 
-            return max(zip(alphabet, outputs), key=itemgetter(1))[0]
+            outputs, overflowed = batch_network.activate(inputs_float_values)
+
+            if overflowed.any():
+                raise OverflowError('The CPPN overflowed for a neighbourhood the CA visited')
+
+            return argmax_first(outputs)
 
         yield initial_grid
 
         for grid in iterate_ca_n_times_or_until_cycle_found(
                 initial_grid=initial_grid,
-                transition_f=transition_f,
+                transition_f=create_coord_transition_f(rule_table, rule_f, initial_grid),
                 n=iterations,
-                iterate_f=iterate_ca_once_with_coord_inputs
+                iterate_f=create_coord_iterate_f(rule_table, rule_f)
         ):
             yield grid
 
     grid_iterations = ca_develop(phenotype)
 
-    best = 0.0
-    for i, grid in enumerate(grid_iterations):
-        correctness_fraction = count_correct_cells(grid.get_whole(), target_pattern=target_pattern) / pattern_area
-
-        if correctness_fraction >= 1.0:
-            return correctness_fraction
-
-        if correctness_fraction > best:
-            best = correctness_fraction
-
-    k = 5
-    redistribute = lambda x: x * exp(k * x) / exp(k)
-
-    return redistribute(best)
+    return score_morphogenesis_development(grid_iterations, initial_grid.encode_pattern(target_pattern))
 
 
 FITNESS_F = morphogenesis_fitness_f_with_coord_input
@@ -13,6 +13,7 @@ CA_CONFIG = CAConfig()
 CA_CONFIG.alphabet = ALPHABET_4
 CA_CONFIG.neighbourhood = VON_NEUMANN
 CA_CONFIG.iterations = 30
+CA_CONFIG.memoize_fitness = False  # the CPPN also takes the coordinates of the cells
 CA_CONFIG.etc = {
     'pattern': pad_pattern(NORWEGIAN, QUIESCENT),
     'wanted_occurrences': 3,
@@ -63,6 +64,7 @@ def replication_fitness_f_with_coord_inputs(phenotype: FeedForwardNetwork, ca_co
     from ca_neat.geometry.cell_grid import CellGrid2D, CellGrid
     from statistics import mean
     from ca_neat.utils import create_state_normalization_rules
+    from ca_neat.nn.codegen import compile_network
     from operator import itemgetter
     from neat.nn import FeedForwardNetwork
     from typing import Sequence, Iterator
@@ -93,6 +95,9 @@ def replication_fitness_f_with_coord_inputs(phenotype: FeedForwardNetwork, ca_co
         return new
 
     def ca_develop(network: FeedForwardNetwork) -> Iterator[CellGrid2D]:
+        # the CPPN is evaluated by a function generated for it, rather than by serial_activate
+        activate = compile_network(network)
+
         def transition_f(inputs_discrete_values: Sequence[CELL_STATE_T]) -> CELL_STATE_T:
             neighbour_values, xy_values = inputs_discrete_values[:-2], inputs_discrete_values[-2:]
 
@@ -102,7 +107,7 @@ def replication_fitness_f_with_coord_inputs(phenotype: FeedForwardNetwork, ca_co
             inputs_float_values = tuple(state_normalization_rules[n] for n in neighbour_values) + \
                                   tuple(coord_normalization_rules[n] for n in xy_values)
 
-            outputs = network.serial_activate(inputs_float_values)
+            outputs = activate(inputs_float_values)
 
             return max(zip(alphabet, outputs), key=itemgetter(1))[0]
 
@@ -18,6 +18,7 @@ TESTS = list(range(2, 7))
 def fitness_f(phenotype: FeedForwardNetwork, ca_config: CAConfig) -> float:
     from ca_neat.ca.iterate import iterate_ca_n_times_or_until_cycle_found
     from ca_neat.utils import create_state_normalization_rules
+    from ca_neat.nn.codegen import compile_network
     from operator import itemgetter
     from neat.nn import FeedForwardNetwork
     from typing import Iterator
@@ -33,13 +34,16 @@ def fitness_f(phenotype: FeedForwardNetwork, ca_config: CAConfig) -> float:
     state_normalization_rules = create_state_normalization_rules(states=alphabet)
 
     def ca_develop(grid, network: FeedForwardNetwork) -> Iterator[GRID_T]:
+        # the CPPN is evaluated by a function generated for it, rather than by serial_activate
+        activate = compile_network(network)
+
         def transition_f(inputs_discrete_values: Sequence[CELL_STATE_T]) -> CELL_STATE_T:
             if all((x == grid.dead_cell) for x in inputs_discrete_values):
                 return grid.dead_cell
 
             inputs_float_values = tuple(state_normalization_rules[x] for x in inputs_discrete_values)
 
-            outputs = network.serial_activate(inputs_float_values)
+            outputs = activate(inputs_float_values)
 
             return max(zip(alphabet, outputs), key=itemgetter(1))[0]
 
@@ -87,6 +91,7 @@ CA_CONFIG.alphabet = list(range(STATES))
 CA_CONFIG.neighbourhood = LLLCRRR
 CA_CONFIG.iterations = ITERATIONS
 CA_CONFIG.compute_lambda = False
+CA_CONFIG.memoize_fitness = False  # the rule table has 8 ** 7 entries, compiling it costs more than the fitness
 
 CA_CONFIG.etc = {
     'tests': TESTS,
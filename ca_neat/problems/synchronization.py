@@ -24,55 +24,42 @@ assert K % 2 == 0
 
 
 def fitness_f(phenotype: FeedForwardNetwork, ca_config: CAConfig) -> float:
-    from operator import itemgetter
-    from typing import Iterator, Sequence
-    from neat.nn import FeedForwardNetwork
-    from ca_neat.ca.iterate import iterate_ca_n_times_or_until_cycle_found
-    from ca_neat.utils import create_state_normalization_rules
-    from ca_neat.geometry.cell_grid import ToroidalCellGrid1D, CELL_STATE_T
+    from ca_neat.ca.batch import encode_states, final_states, find_cycle_ends
+    from ca_neat.ca.bitpacked import iterate_ca_batch_bitpacked, pack_rows, word_mask
+    from ca_neat.ca.rule_table_cache import compile_rule_table_cached
     from random import shuffle
 
-    GRID_T = ToroidalCellGrid1D
-
     alphabet = ca_config.alphabet
-
     iterations = ca_config.iterations
-    state_normalization_rules = create_state_normalization_rules(states=alphabet)
-
-    def ca_develop(grid, network: FeedForwardNetwork) -> Iterator[GRID_T]:
-        def transition_f(inputs_discrete_values: Sequence[CELL_STATE_T]) -> CELL_STATE_T:
-            inputs_float_values = tuple(state_normalization_rules[x] for x in inputs_discrete_values)
-
-            outputs = network.serial_activate(inputs_float_values)
-
-            return max(zip(alphabet, outputs), key=itemgetter(1))[0]
 
-        yield grid
-
-        for grid_it in iterate_ca_n_times_or_until_cycle_found(grid, transition_f, iterations):
-            yield grid_it
+    # the transition function of this problem does not force quiescent neighbourhoods to stay quiescent
+    rule_table = compile_rule_table_cached(phenotype, ca_config, quiescent_stable=False)
 
     def test(selection) -> int:
-        points = 0
-        for pattern in selection:
-            x_range = (0, len(pattern))
-            neighbourhood = ca_config.neighbourhood
-
-            init_grid = GRID_T(
-                cell_states=alphabet,
-                x_range=x_range,
-                values={(i,): x for i, x in enumerate(pattern)},
-                neighbourhood=neighbourhood,
-            )
-
-            *_, second_last, last = ca_develop(init_grid, phenotype)
+        if not selection:
+            return 0
+
+        width = len(selection[0])
+
+        # all patterns of the selection are developed together, each pattern packed into a single word
+        trajectory = iterate_ca_batch_bitpacked(
+            words=pack_rows(encode_states(selection, alphabet)),
+            rule_table=rule_table,
+            neighbourhood=ca_config.neighbourhood,
+            width=width,
+            n=iterations,
+            toroidal=True,
+        )
+        ends = find_cycle_ends(trajectory)
 
-            a, b = next(last.yield_values()), next(second_last.yield_values())
+        last = final_states(trajectory, ends)
+        second_last = final_states(trajectory, ends - 1)
 
-            if a != b and all(x == a for x in last.yield_values()) and all(x == b for x in second_last.yield_values()):
-                points += 1
+        # synchronized CAs alternate between all cells being in one state and all cells being in the other
+        all_ones = word_mask(width)
+        synchronized = ((last == 0) | (last == all_ones)) & (second_last == last ^ all_ones)
 
-        return points
+        return int(synchronized.sum())
 
     # Out of K total patterns we first do a test on I samples.
     # If any points are achieved from the I patterns, the rest of the patterns are also tested.
@@ -98,6 +85,7 @@ CA_CONFIG.alphabet = ALPHABET_2
 CA_CONFIG.neighbourhood = LLLCRRR
 CA_CONFIG.iterations = M
 CA_CONFIG.compute_lambda = False
+CA_CONFIG.memoize_fitness = False  # the test patterns are sampled at random
 
 patterns = []
 for _ in range(K):
@@ -2,33 +2,40 @@ import sqlite3
 from operator import attrgetter
 from random import choice
 from statistics import median, mean
-from typing import Callable, Dict, List, Optional, Set, Tuple
+from typing import Callable, Dict, List, Optional, Sequence, Set, Tuple
 from uuid import UUID
 
 import kombu.exceptions
 import sqlalchemy.exc
 from celery.canvas import chain
 from neat.genome import Genome
-from neat.nn import FeedForwardNetwork, create_feed_forward_phenotype
+from neat.nn import FeedForwardNetwork
 from neat.species import Species
 
-from ca_neat.ca.analysis import calculate_lambda
+from ca_neat.ca.analysis import RuleProperties
+from ca_neat.ca.rule_table_cache import compile_rule_table_cached
 from ca_neat.config import CAConfig, CPPNNEATConfig
 from ca_neat.database import Individual, Scenario, get_db
+from ca_neat.fitness_memo import FitnessMemo
 from ca_neat.ga.population import create_initial_population, neat_reproduction, sort_into_species, speciate
 from ca_neat.ga.selection import PAIR_SELECTION_F_T
 from ca_neat.ga.serialize import deserialize_gt, serialize_gt
+from ca_neat.nn.prune import create_pruned_feed_forward_phenotype
 from ca_neat.report import send_message_via_pushbullet
 from ca_neat.utils import pluck
 from celery_app import app
 
 FITNESS_F_T = Callable[[FeedForwardNetwork, CAConfig], float]
+BATCH_FITNESS_F_T = Callable[[Sequence[FeedForwardNetwork], CAConfig], Sequence[float]]
 
 AUTO_RETRY = {
     'autoretry_for': (sqlalchemy.exc.OperationalError, sqlite3.OperationalError),
     'retry_kwargs': {'countdown': 5},
 }
 
+# the fitnesses evaluated by this worker process
+fitness_memo = FitnessMemo()
+
 
 class SpeciesSet:
     """
@@ -99,14 +106,25 @@ def initialize_generation(db_path: str, scenario_id: int, generation: int, genot
                           ca_config: CAConfig) -> None:
     from celery import group, chord
 
-    grouped_tasks = group(handle_individual.s(
-        scenario_id=scenario_id,
-        generation=generation,
-        individual_number=i,
-        genotype=genotype,
-        fitness_f=fitness_f,
-        ca_config=ca_config,
-    ) for i, genotype in enumerate(genotypes))
+    if getattr(fitness_f, 'batch', None) is None:
+        grouped_tasks = group(handle_individual.s(
+            scenario_id=scenario_id,
+            generation=generation,
+            individual_number=i,
+            genotype=genotype,
+            fitness_f=fitness_f,
+            ca_config=ca_config,
+        ) for i, genotype in enumerate(genotypes))
+    else:
+        batch_size = ca_config.batch_size
+        grouped_tasks = group(handle_individuals.s(
+            scenario_id=scenario_id,
+            generation=generation,
+            first_individual_number=i,
+            genotypes=genotypes[i:i + batch_size],
+            fitness_f=fitness_f,
+            ca_config=ca_config,
+        ) for i in range(0, len(genotypes), batch_size))
 
     final_task = persist_results.subtask(
         args=(db_path, scenario_id, generation, fitness_f, pair_selection_f, neat_config, ca_config),
@@ -118,6 +136,13 @@ def initialize_generation(db_path: str, scenario_id: int, generation: int, genot
 @app.task(name='persist_results', bind=True, **AUTO_RETRY)
 def persist_results(task, results, db_path: str, scenario_id: int, generation_n: int, fitness_f: FITNESS_F_T,
                     pair_selection_f: PAIR_SELECTION_F_T, neat_config: CPPNNEATConfig, ca_config: CAConfig) -> str:
+    # batched evaluation tasks return a list of individuals each
+    results = [
+        individual
+        for result in results
+        for individual in (result if isinstance(result, list) else [result])
+    ]
+
     db = get_db(db_path)
     session = db.Session()
     session.bulk_save_objects(results)
@@ -295,18 +320,48 @@ def reproduction(task, results, db_path: str, scenario_id: int, generation_n: in
     )
 
 
+def look_up_fitness(scenario_id: int, generation: int, genotype: Genome, phenotype: FeedForwardNetwork,
+                    fitness_f: FITNESS_F_T, ca_config: CAConfig) -> Tuple[Optional[bytes], Optional[float]]:
+    """
+    sets the fitness of the genotype if the memo has it, returning its λ.
+    otherwise returns the key to store the fitness of the genotype under, which is None if it is not memoized.
+    """
+
+    rule_table_size = len(ca_config.alphabet) ** len(ca_config.neighbourhood)
+    if not ca_config.memoize_fitness or rule_table_size > ca_config.memoize_max_rule_table_size:
+        return None, None
+
+    # report the hit rate of the previous generation when the first individual of a generation arrives
+    if not fitness_memo.lookups[(scenario_id, generation)] and fitness_memo.lookups[(scenario_id, generation - 1)]:
+        print(fitness_memo.report(scenario_id, generation - 1))
+
+    # the table without the quiescent rule also determines λ
+    rule_table = compile_rule_table_cached(phenotype, ca_config, quiescent_stable=False)
+    memo_key = fitness_memo.key(rule_table, fitness_f, ca_config)
+
+    entry = fitness_memo.get(memo_key, scenario_id, generation)
+    if entry is not None:
+        genotype.fitness, λ = entry
+        return None, λ
+
+    return memo_key, None
+
+
 @app.task(name='handle_individual', **AUTO_RETRY)
 def handle_individual(scenario_id: int, generation: int, individual_number: int, genotype: Genome,
                       fitness_f: FITNESS_F_T, ca_config: CAConfig) -> Individual:
-    λ = None
     phenotype = None
 
     if (genotype.fitness is None) or ca_config.compute_lambda:
-        phenotype = create_feed_forward_phenotype(genotype)
+        phenotype = create_pruned_feed_forward_phenotype(genotype)
+
+    memo_key = None
+    λ = None
 
     if genotype.fitness is None:
-        phenotype = create_feed_forward_phenotype(genotype)
+        memo_key, λ = look_up_fitness(scenario_id, generation, genotype, phenotype, fitness_f, ca_config)
 
+    if genotype.fitness is None:
         try:
             genotype.fitness = fitness_f(phenotype, ca_config)
         except OverflowError:
@@ -314,12 +369,65 @@ def handle_individual(scenario_id: int, generation: int, individual_number: int,
 
         assert 0.0 <= genotype.fitness <= 1.0
 
-    if ca_config.compute_lambda:
-        try:
-            λ = calculate_lambda(cppn=phenotype, ca_config=ca_config)
-        except OverflowError:
+    individual = create_individual(scenario_id, generation, individual_number, genotype, phenotype, ca_config, λ)
+
+    # create_individual zeroes the fitness of individuals whose λ overflows
+    if memo_key is not None:
+        fitness_memo.put(memo_key, individual.fitness, individual.λ)
+
+    return individual
+
+
+@app.task(name='handle_individuals', **AUTO_RETRY)
+def handle_individuals(scenario_id: int, generation: int, first_individual_number: int, genotypes: List[Genome],
+                       fitness_f: FITNESS_F_T, ca_config: CAConfig) -> List[Individual]:
+    """
+    evaluates a chunk of individuals at once with fitness_f.batch, which gives the same fitnesses as fitness_f
+    """
+
+    batch_fitness_f: BATCH_FITNESS_F_T = fitness_f.batch
+    phenotypes = [create_pruned_feed_forward_phenotype(genotype) for genotype in genotypes]
+
+    memo_keys: List[Optional[bytes]] = [None] * len(genotypes)
+    lambdas: List[Optional[float]] = [None] * len(genotypes)
+
+    for i, (genotype, phenotype) in enumerate(zip(genotypes, phenotypes)):
+        if genotype.fitness is None:
+            memo_keys[i], lambdas[i] = look_up_fitness(scenario_id, generation, genotype, phenotype, fitness_f,
+                                                       ca_config)
+
+    unevaluated = [i for i, genotype in enumerate(genotypes) if genotype.fitness is None]
+    fitnesses = batch_fitness_f([phenotypes[i] for i in unevaluated], ca_config)
+
+    for i, fitness in zip(unevaluated, fitnesses):
+        genotypes[i].fitness = fitness
+
+        assert 0.0 <= fitness <= 1.0
+
+    individuals = [
+        create_individual(scenario_id, generation, first_individual_number + i, genotype, phenotype, ca_config, λ)
+        for i, (genotype, phenotype, λ) in enumerate(zip(genotypes, phenotypes, lambdas))
+    ]
+
+    for memo_key, individual in zip(memo_keys, individuals):
+        if memo_key is not None:
+            fitness_memo.put(memo_key, individual.fitness, individual.λ)
+
+    return individuals
+
+
+def create_individual(scenario_id: int, generation: int, individual_number: int, genotype: Genome,
+                      phenotype: Optional[FeedForwardNetwork], ca_config: CAConfig,
+                      λ: Optional[float] = None) -> Individual:
+    if ca_config.compute_lambda and λ is None:
+        # the rule table is shared with the fitness memo and the fitness function through the rule table cache
+        properties = RuleProperties.from_cppn(phenotype, ca_config)
+
+        if properties.overflowed:
             genotype.fitness = 0.0
             λ = 0.0
+        else:
+            λ = properties.λ
 
     individual = Individual(
         scenario_id=scenario_id,
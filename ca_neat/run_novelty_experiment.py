@@ -6,7 +6,6 @@ from uuid import UUID
 from celery.canvas import chain
 from distance import hamming
 from neat.genome import Genome
-from neat.nn import create_feed_forward_phenotype
 from neat.species import Species
 
 from ca_neat.ca.analysis import serialize_cppn_rule
@@ -15,6 +14,7 @@ from ca_neat.database import Individual, Innovation, Scenario, get_db
 from ca_neat.ga.population import create_initial_population, neat_reproduction, sort_into_species, speciate
 from ca_neat.ga.selection import PAIR_SELECTION_F_T
 from ca_neat.ga.serialize import deserialize_gt
+from ca_neat.nn.prune import create_pruned_feed_forward_phenotype
 from ca_neat.run_experiment import AUTO_RETRY, FITNESS_F_T, handle_individual
 from ca_neat.utils import pluck
 from celery_app import app
@@ -85,11 +85,11 @@ def initialize_generation(db_path: str, scenario_id: int, generation: int, genot
                 pass
             else:
                 if gt not in serialized:
-                    pt = create_feed_forward_phenotype(gt)
+                    pt = create_pruned_feed_forward_phenotype(gt)
                     _, serialized[gt] = serialize_cppn_rule(cppn=pt, ca_config=ca_config)
 
                 if other_gt not in serialized:
-                    pt = create_feed_forward_phenotype(other_gt)
+                    pt = create_pruned_feed_forward_phenotype(other_gt)
                     _, serialized[other_gt] = serialize_cppn_rule(cppn=pt, ca_config=ca_config)
 
                 a = serialized[gt]
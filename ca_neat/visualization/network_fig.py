@@ -1,6 +1,8 @@
 import graphviz
 from neat.genome import Genome
 
+from ca_neat.nn.prune import reachable_from, reaching
+
 REGULAR_NODE_STYLE = {'shape': 'circle', 'fontsize': '9', 'height': '0.2', 'width': '0.2', 'style': 'filled',
                       'fillcolor': 'white', }
 OUTPUT_NODE_STYLE = {'style': 'filled', 'fillcolor': 'lightblue', }
@@ -33,23 +35,9 @@ def draw_net(genome: Genome, view=False, filename=None, show_disabled=False, pru
         connections = set(cg for cg in genome.conn_genes.values() if cg.enabled)
 
     if prune_unused:
-        can_reach_from_input = set(ng.ID for ng in inputs)
-        can_reach_from_output = set(ng.ID for ng in outputs)
-
-        finished = False
-        while not finished:
-            finished = True
-            for connection in connections:
-                a = connection.in_node_id
-                b = connection.out_node_id
-
-                if b not in can_reach_from_input and a in can_reach_from_input:
-                    can_reach_from_input.add(b)
-                    finished = False
-
-                if a not in can_reach_from_output and b in can_reach_from_output:
-                    can_reach_from_output.add(a)
-                    finished = False
+        edges = [(cg.in_node_id, cg.out_node_id) for cg in connections]
+        can_reach_from_input = reachable_from((ng.ID for ng in inputs), edges)
+        can_reach_from_output = reaching((ng.ID for ng in outputs), edges)
 
         used_node_ids = can_reach_from_input & can_reach_from_output
 
@@ -2,7 +2,7 @@ from collections import defaultdict
 from neat.nn import create_feed_forward_phenotype
 from tqdm._tqdm import tqdm
 
-from ca_neat.ca.analysis import serialize_cppn_rule
+from ca_neat.ca.analysis import enumerate_cppn_rule
 from ca_neat.database import get_db, Individual
 from ca_neat.ga.serialize import deserialize_gt
 from properties_investigation.swiss_different_settings import NEAT_CONFIG, CA_CONFIG
@@ -14,15 +14,9 @@ DB_PATH = 'postgresql+psycopg2:///swiss_different_settings_2017-05-21T19:37:44.0
 
 
 def enumerate_to_str_safe(ind):
-    try:
-        _, outputs = serialize_cppn_rule(
-            create_feed_forward_phenotype(
-                deserialize_gt(ind.genotype, NEAT_CONFIG)
-            ), CA_CONFIG
-        )
-        return ''.join(outputs)
-    except OverflowError:
-        return None
+    outputs = enumerate_cppn_rule(create_feed_forward_phenotype(deserialize_gt(ind.genotype, NEAT_CONFIG)), CA_CONFIG)
+
+    return ''.join(outputs) if outputs is not None else None
 
 
 if __name__ == '__main__':
@@ -3,7 +3,7 @@ from statistics import mean
 from neat.nn import create_feed_forward_phenotype
 from tqdm._tqdm import tqdm
 
-from ca_neat.ca.analysis import calculate_sensitivity, calculate_dominance
+from ca_neat.ca.analysis import RuleProperties
 from ca_neat.database import get_db, Individual
 from ca_neat.ga.serialize import deserialize_gt
 from properties_investigation.swiss_different_settings import CA_CONFIG, NEAT_CONFIG
@@ -46,8 +46,9 @@ if __name__ == '__main__':
                 for ind in generation_population:
                     gt = deserialize_gt(ind.genotype, NEAT_CONFIG)
                     pt = create_feed_forward_phenotype(gt)
-                    sensitivities.append(calculate_sensitivity(pt, CA_CONFIG))
-                    dominances.append(calculate_dominance(pt, CA_CONFIG))
+                    properties = RuleProperties.from_cppn(pt, CA_CONFIG)
+                    sensitivities.append(properties.sensitivity)
+                    dominances.append(properties.dominance)
 
                 mean_sensitivities[scenario.id].append(mean(sensitivities))
                 mean_dominances[scenario.id].append(mean(dominances))
@@ -5,14 +5,14 @@ from distance._simpledists import hamming
 from neat.nn import create_feed_forward_phenotype
 from tqdm._tqdm import tqdm
 
-from ca_neat.ca.analysis import serialize_cppn_rule
+from ca_neat.ca.analysis import enumerate_cppn_rule
 from ca_neat.database import get_db, Individual
 from ca_neat.ga.population import create_initial_population
 from ca_neat.ga.serialize import deserialize_gt
 from properties_investigation.swiss_different_settings import NEAT_CONFIG, CA_CONFIG
 
 # DB_PATH = 'postgresql+psycopg2:///swiss_different_settings_2017-05-15T23:24:06.993649'
-from properties_investigation.vestigial import find_nodes_connected_to_output
+from ca_neat.nn.prune import find_nodes_connected_to_output
 
 DB_PATH = 'postgresql+psycopg2:///swiss_different_settings_2017-05-21T19:37:44.047610'
 G = 100
@@ -20,15 +20,7 @@ SCENARIO = 5
 
 
 def enumerate_safe(gt):
-    try:
-        _, outputs = serialize_cppn_rule(
-            create_feed_forward_phenotype(
-                gt
-            ), CA_CONFIG
-        )
-        return outputs
-    except OverflowError:
-        return None
+    return enumerate_cppn_rule(create_feed_forward_phenotype(gt), CA_CONFIG)
 
 
 if __name__ == '__main__':
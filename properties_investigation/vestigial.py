@@ -1,11 +1,11 @@
 from statistics import mean
 
 from collections import defaultdict
-from neat.genome import Genome
 from tqdm._tqdm import tqdm
 
 from ca_neat.database import get_db
 from ca_neat.ga.serialize import deserialize_gt
+from ca_neat.nn.prune import find_nodes_connected_to_output
 from properties_investigation.swiss_different_settings import NEAT_CONFIG
 
 # DB_PATH = 'postgresql+psycopg2:///swiss_different_settings_2017-05-15T23:24:06.993649'
@@ -13,30 +13,6 @@ DB_PATH = 'postgresql+psycopg2:///swiss_different_settings_2017-05-21T19:37:44.0
 G = 100
 
 
-def find_nodes_connected_to_output(genome: Genome):
-    outputs = set(ng for ng in genome.node_genes.values() if ng.type == 'OUTPUT')
-    connections = [c for c in genome.conn_genes.values() if c.enabled]
-
-    can_reach_from_output = set(ng.ID for ng in outputs)
-
-    finished = False
-    while not finished:
-        finished = True
-        for connection in connections:
-            a = connection.in_node_id
-            b = connection.out_node_id
-
-            # if b not in can_reach_from_input and a in can_reach_from_input:
-            #     can_reach_from_input.add(b)
-            #     finished = False
-
-            if a not in can_reach_from_output and b in can_reach_from_output:
-                can_reach_from_output.add(a)
-                finished = False
-
-    return can_reach_from_output
-
-
 if __name__ == '__main__':
     DB = get_db(DB_PATH)
     session = DB.Session()